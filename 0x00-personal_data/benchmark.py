@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the personal data tools.
+
+    ./benchmark.py redact    records/s of filter_datum against message
+                             length and field count, next to the original
+                             per-call regex implementation
+    ./benchmark.py logger    caller-side latency of logger.info from
+                             get_logger() in sync and async mode
+    ./benchmark.py scrub     MB/s of scrub_logs.scrub on a generated log
+                             file of several GB
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+from typing import Callable, List, Optional
+
+from filtered_logger import filter_datum, get_logger
+from scrub_logs import scrub
+
+
+def legacy_filter_datum(fields: List[str], redaction: str, message: str,
+                        separator: str) -> str:
+    """
+    The original filter_datum, rebuilding its pattern on every call.
+    """
+    pattern = f'({"|".join(fields)})=.*?{separator}'
+    return re.sub(pattern, lambda m:
+                  f'{m.group(1)}={redaction}{separator}', message)
+
+
+def make_message(total_fields: int) -> str:
+    """
+    Build a `key=value;` log line with `total_fields` fields.
+
+    Args:
+        total_fields (int): Number of fields in the line.
+
+    Returns:
+        str: The log line.
+    """
+    return "".join(f"field{i}=value-{i:06d};" for i in range(total_fields))
+
+
+def records_per_second(fn: Callable[[str], str], message: str,
+                       seconds: float) -> float:
+    """
+    Call fn(message) repeatedly for about `seconds` and return calls/s.
+    """
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        for _ in range(100):
+            fn(message)
+        count += 100
+        now = time.perf_counter()
+        if now >= deadline:
+            return count / (now - start)
+
+
+def bench_redact(lengths: List[int], field_counts: List[int],
+                 seconds: float) -> None:
+    """
+    Print records/s for every (message fields, redacted fields) pair.
+
+    Args:
+        lengths (List[int]): Fields per message.
+        field_counts (List[int]): Fields to redact per call.
+        seconds (float): Time spent per measurement.
+    """
+    print(f"{'msg fields':>10} {'msg bytes':>9} {'redacted':>8} "
+          f"{'legacy rec/s':>13} {'redactor rec/s':>15} {'speedup':>7}")
+    for length in lengths:
+        message = make_message(length)
+        counts = sorted({min(count, length) for count in field_counts})
+        for count in counts:
+            fields = [f"field{i}" for i in range(0, length, max(
+                1, length // count))][:count]
+            legacy = records_per_second(
+                lambda m: legacy_filter_datum(fields, "***", m, ";"),
+                message, seconds)
+            current = records_per_second(
+                lambda m: filter_datum(fields, "***", m, ";"),
+                message, seconds)
+            print(f"{length:>10} {len(message):>9} {len(fields):>8} "
+                  f"{legacy:>13,.0f} {current:>15,.0f} "
+                  f"{current / legacy:>6.1f}x")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    index = max(0, min(len(sorted_values) - 1,
+                       int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def bench_logger_mode(async_mode: bool, calls: int, block: bool) -> None:
+    """
+    Time each logger.info call in this process and print one result line.
+
+    The logger writes to stderr, which the parent discards.
+    """
+    logger = get_logger(async_mode=async_mode, block=block)
+    message = make_message(8).replace("field0", "email").replace(
+        "field1", "password")
+    durations = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        logger.info(message)
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    dropped = sum(getattr(handler, "dropped", 0)
+                  for handler in logger.handlers)
+    print(f"{'async' if async_mode else 'sync':>5}: "
+          f"mean={sum(durations) / calls * 1e6:6.2f}us "
+          f"p50={percentile(durations, 0.5) * 1e6:6.2f}us "
+          f"p99={percentile(durations, 0.99) * 1e6:6.2f}us "
+          f"dropped={dropped}", flush=True)
+
+
+def bench_logger(calls: int, block: bool) -> None:
+    """
+    Run the logger benchmark once per mode, each in a fresh interpreter
+    because get_logger configures the logger only once per process.
+
+    Args:
+        calls (int): logger.info calls per mode.
+        block (bool): Block instead of dropping when the async queue fills.
+    """
+    for mode in ("sync", "async"):
+        command = [sys.executable, os.path.abspath(__file__), "logger",
+                   "--calls", str(calls), "--mode", mode]
+        if block:
+            command.append("--block")
+        subprocess.run(command, check=True, stderr=subprocess.DEVNULL)
+
+
+def write_log(path: str, size: int) -> int:
+    """
+    Write about `size` bytes of formatted user_data log lines to `path`.
+
+    Args:
+        path (str): File to create.
+        size (int): Target size in bytes.
+
+    Returns:
+        int: The number of bytes written.
+    """
+    block = "".join(
+        f"[HOLBERTON] user_data INFO 2019-11-19 18:24:25,105: "
+        f"name=user{i}; email=user{i}@example.com; phone=555-{i:07d}; "
+        f"ssn={i:09d}; password=secret{i}; ip=10.0.{i % 256}.{i % 7}; "
+        f"last_login=2019-11-14 06:16:24; user_agent=Mozilla/5.0;\n"
+        for i in range(8192)).encode("utf-8")
+    written = 0
+    with open(path, "wb") as f:
+        while written < size:
+            written += f.write(block)
+    return written
+
+
+def bench_scrub(size_gb: float, workers: List[int],
+                directory: Optional[str]) -> None:
+    """
+    Generate one log file and print scrub() throughput per worker count.
+
+    Args:
+        size_gb (float): Size of the generated log in GB.
+        workers (List[int]): Worker process counts to measure.
+        directory (str): Where to put the files, default the temp dir.
+    """
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        src = os.path.join(tmp, "user_data.log")
+        dst = os.path.join(tmp, "user_data.scrubbed.log")
+        size = write_log(src, int(size_gb * 1e9))
+        print(f"{size / 1e6:,.0f} MB of log lines")
+        print(f"{'workers':>7} {'seconds':>8} {'MB/s':>8}")
+        for count in workers:
+            start = time.perf_counter()
+            scrub(src, dst, workers=count)
+            elapsed = time.perf_counter() - start
+            os.remove(dst)
+            print(f"{count:>7} {elapsed:>8.2f} {size / 1e6 / elapsed:>8.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    redact = commands.add_parser("redact", help="filter_datum throughput")
+    redact.add_argument("--lengths", default="5,20,100,500",
+                        help="fields per message (default: 5,20,100,500)")
+    redact.add_argument("--fields", default="1,5,20",
+                        help="fields redacted per call (default: 1,5,20)")
+    redact.add_argument("--seconds", type=float, default=0.5,
+                        help="time per measurement (default: 0.5)")
+
+    logger = commands.add_parser("logger", help="logger.info latency")
+    logger.add_argument("--calls", type=int, default=100000,
+                        help="logger.info calls per mode (default: 100000)")
+    logger.add_argument("--block", action="store_true",
+                        help="block instead of dropping on a full queue")
+    logger.add_argument("--mode", choices=("sync", "async"),
+                        help=argparse.SUPPRESS)
+
+    scrub_ = commands.add_parser("scrub", help="scrub_logs throughput")
+    scrub_.add_argument("--size-gb", type=float, default=2.0,
+                        help="size of the generated log (default: 2)")
+    scrub_.add_argument("--workers", default=f"1,{os.cpu_count() or 1}",
+                        help="worker counts (default: 1,<cpu count>)")
+    scrub_.add_argument("--dir", help="directory for the files")
+
+    args = parser.parse_args(argv)
+    if args.command == "redact":
+        bench_redact([int(n) for n in args.lengths.split(",")],
+                     [int(n) for n in args.fields.split(",")], args.seconds)
+    elif args.command == "logger" and args.mode:
+        bench_logger_mode(args.mode == "async", args.calls, args.block)
+    elif args.command == "logger":
+        bench_logger(args.calls, args.block)
+    elif args.command == "scrub":
+        bench_scrub(args.size_gb,
+                    sorted({int(n) for n in args.workers.split(",")}),
+                    args.dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
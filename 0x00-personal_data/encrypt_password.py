@@ -3,12 +3,98 @@
 Module for secure password hashing and validation using bcrypt.
 """
 
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+
 import bcrypt
 
 
+def hash_timings(max_cost: int = 16, min_cost: int = 4,
+                 budget_ms: float = None) -> Dict[int, float]:
+    """
+    Time one bcrypt hash at each cost level.
+
+    Args:
+        max_cost (int): Highest cost to try.
+        min_cost (int): Lowest cost to try.
+        budget_ms (float): Stop after the first cost slower than this.
+
+    Returns:
+        Dict[int, float]: Milliseconds per hash, keyed by cost.
+    """
+    timings = {}
+    for cost in range(min_cost, max_cost + 1):
+        salt = bcrypt.gensalt(cost)
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration", salt)
+        timings[cost] = (time.perf_counter() - start) * 1000
+        if budget_ms is not None and timings[cost] > budget_ms:
+            break
+    return timings
+
+
+def calibrate_cost(budget_ms: float, max_cost: int = 16,
+                   min_cost: int = 4) -> Tuple[int, Dict[int, float]]:
+    """
+    Pick the highest bcrypt cost whose hash time fits the budget.
+
+    Args:
+        budget_ms (float): Per-hash latency budget in milliseconds.
+        max_cost (int): Highest cost allowed.
+        min_cost (int): Cost used even if it exceeds the budget.
+
+    Returns:
+        Tuple[int, Dict[int, float]]: The chosen cost and the timings.
+    """
+    timings = hash_timings(max_cost, min_cost, budget_ms)
+    fitting = [cost for cost, ms in timings.items() if ms <= budget_ms]
+    return max(fitting, default=min_cost), timings
+
+
+BCRYPT_BUDGET_MS = os.getenv("BCRYPT_BUDGET_MS")
+BCRYPT_MIN_COST = int(os.getenv("BCRYPT_MIN_COST", 10))
+if BCRYPT_BUDGET_MS:
+    BCRYPT_ROUNDS = calibrate_cost(float(BCRYPT_BUDGET_MS),
+                                   min_cost=BCRYPT_MIN_COST)[0]
+else:
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+
+
+def hash_cost(hashed_password: bytes) -> int:
+    """
+    Read the cost factor out of a bcrypt hash.
+
+    Args:
+        hashed_password (bytes): A `$2b$NN$...` hash.
+
+    Returns:
+        int: The cost the hash was made with.
+    """
+    return int(hashed_password[4:6])
+
+
+def needs_rehash(hashed_password: bytes) -> bool:
+    """
+    Tell whether a hash is weaker than BCRYPT_ROUNDS.
+
+    Stronger hashes are kept, so a process that calibrated a lower cost
+    never downgrades them.
+
+    Args:
+        hashed_password (bytes): A `$2b$NN$...` hash.
+
+    Returns:
+        bool: True if the hash should be replaced after the next login.
+    """
+    return hash_cost(hashed_password) < BCRYPT_ROUNDS
+
+
 def hash_password(password: str) -> bytes:
     """
-    Hash a password with bcrypt.
+    Hash a password with bcrypt at BCRYPT_ROUNDS.
 
     Args:
         password (str): The password to hash.
@@ -16,7 +102,7 @@ def hash_password(password: str) -> bytes:
     Returns:
         bytes: The hashed password.
     """
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS))
 
 
 def is_valid(hashed_password: bytes, password: str) -> bool:
@@ -31,3 +117,30 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
         bool: True if the password matches, False otherwise.
     """
     return bcrypt.checkpw(password.encode(), hashed_password)
+
+
+def hash_passwords(passwords: Iterable[str],
+                   max_workers: int = None) -> List[bytes]:
+    """
+    Hash many passwords with bcrypt, spread across all cores.
+
+    bcrypt releases the GIL while hashing, so a thread pool is enough
+    to keep every core busy.
+
+    Args:
+        passwords (Iterable[str]): The passwords to hash.
+        max_workers (int): Worker count, defaults to the CPU count.
+
+    Returns:
+        List[bytes]: The hashed passwords, in input order.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as ex:
+        return list(ex.map(hash_password, passwords))
+
+
+if __name__ == "__main__":
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 250
+    cost, timings = calibrate_cost(budget)
+    for level, ms in timings.items():
+        print(f"cost {level:2d}: {ms:9.1f} ms")
+    print(f"BCRYPT_ROUNDS={cost} fits a {budget:.0f} ms budget")
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Redact PII from existing log files in parallel, line-aligned shards.
+"""
+
+import os
+import sys
+import gzip
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from filtered_logger import PII_FIELDS, RedactingFormatter, get_redactor
+
+_redactor = None
+
+
+def _init_worker(fields: Tuple[str, ...], redaction: str,
+                 separator: str) -> None:
+    """
+    Build the worker process's Redactor once.
+    """
+    global _redactor
+    _redactor = get_redactor(fields, redaction, separator)
+
+
+def redact_chunk(data: bytes) -> bytes:
+    """
+    Redact a block of whole log lines.
+
+    Undecodable bytes are carried through unchanged.
+
+    Args:
+        data (bytes): One or more complete lines.
+
+    Returns:
+        bytes: The redacted lines.
+    """
+    text = data.decode("utf-8", "surrogateescape")
+    return _redactor.redact(text).encode("utf-8", "surrogateescape")
+
+
+def redact_range(path: str, start: int, end: int) -> bytes:
+    """
+    Read bytes [start, end) of a plain file and redact them.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        return redact_chunk(f.read(end - start))
+
+
+def line_aligned_ranges(path: str,
+                        shard_size: int) -> Iterator[Tuple[int, int]]:
+    """
+    Split a plain file into (start, end) byte ranges ending on newlines.
+
+    Args:
+        path (str): The file to split.
+        shard_size (int): Approximate size of each range in bytes.
+
+    Yields:
+        Tuple[int, int]: Consecutive ranges covering the whole file.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            end = start + shard_size
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            else:
+                end = size
+            yield start, end
+            start = end
+
+
+def line_aligned_chunks(stream: BinaryIO, shard_size: int) -> Iterator[bytes]:
+    """
+    Read a non-seekable stream as blocks of whole lines.
+
+    Args:
+        stream (BinaryIO): The stream to read, e.g. a gzip file.
+        shard_size (int): Approximate size of each block in bytes.
+
+    Yields:
+        bytes: Consecutive blocks ending on a newline or end of stream.
+    """
+    while True:
+        data = stream.read(shard_size)
+        if not data:
+            return
+        yield data + stream.readline()
+
+
+def _open_output(path: str) -> BinaryIO:
+    """
+    Open the destination, gzip-compressed when it ends in `.gz`.
+    """
+    if path == "-":
+        return sys.stdout.buffer
+    if path.endswith(".gz"):
+        return gzip.open(path, "wb", compresslevel=6)
+    return open(path, "wb", buffering=1 << 20)
+
+
+def scrub(src: str, dst: str, workers: Optional[int] = None,
+          shard_size: int = 8 << 20, fields: Tuple[str, ...] = PII_FIELDS,
+          redaction: str = RedactingFormatter.REDACTION,
+          separator: str = RedactingFormatter.SEPARATOR) -> int:
+    """
+    Redact `src` into `dst`, preserving line order.
+
+    Plain inputs are split into byte ranges that each worker reads for
+    itself; gzip inputs are decompressed here and handed out as blocks.
+    At most two shards per worker are in flight, so memory stays bounded.
+
+    Args:
+        src (str): Input log file, gzip-compressed if it ends in `.gz`.
+        dst (str): Output file, `-` for stdout, gzip if it ends in `.gz`.
+        workers (int): Process count, defaults to the CPU count.
+        shard_size (int): Approximate shard size in bytes.
+        fields (Tuple[str, ...]): Field names to obfuscate.
+        redaction (str): Replacement for each field value.
+        separator (str): String separating the fields.
+
+    Returns:
+        int: The number of redacted bytes written.
+    """
+    workers = workers or os.cpu_count() or 1
+    written = 0
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(tuple(fields), redaction,
+                                       separator)) as pool:
+        out = _open_output(dst)
+        try:
+            pending = deque()
+            if src.endswith(".gz"):
+                stream = gzip.open(src, "rb")
+                jobs = ((redact_chunk, chunk) for chunk
+                        in line_aligned_chunks(stream, shard_size))
+            else:
+                stream = None
+                jobs = ((redact_range, src, start, end) for start, end
+                        in line_aligned_ranges(src, shard_size))
+            for fn, *args in jobs:
+                pending.append(pool.submit(fn, *args))
+                if len(pending) >= workers * 2:
+                    written += out.write(pending.popleft().result())
+            while pending:
+                written += out.write(pending.popleft().result())
+            if stream is not None:
+                stream.close()
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+            else:
+                out.flush()
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("src", help="log file to redact (.gz supported)")
+    parser.add_argument("dst", help="output file, '-' for stdout")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--shard-size", type=int, default=8,
+                        help="shard size in MiB (default: 8)")
+    parser.add_argument("--fields", default=",".join(PII_FIELDS),
+                        help="comma-separated fields to redact")
+    parser.add_argument("--separator", default=RedactingFormatter.SEPARATOR)
+    parser.add_argument("--redaction", default=RedactingFormatter.REDACTION)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    written = scrub(args.src, args.dst, args.workers,
+                    args.shard_size << 20, tuple(args.fields.split(",")),
+                    args.redaction, args.separator)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"redacted {written / 1e6:.1f} MB in {elapsed:.2f}s "
+          f"({written / 1e6 / elapsed:.1f} MB/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+"""
+Shared pytest setup: make the flat modules importable.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
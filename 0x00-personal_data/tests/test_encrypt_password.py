@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for encrypt_password.
+"""
+import importlib
+
+import bcrypt
+
+import encrypt_password
+
+
+def test_hash_and_check(monkeypatch):
+    """
+    A hash validates its password only.
+    """
+    monkeypatch.setattr(encrypt_password, "BCRYPT_ROUNDS", 4)
+    hashed = encrypt_password.hash_password("secret")
+    assert encrypt_password.hash_cost(hashed) == 4
+    assert encrypt_password.is_valid(hashed, "secret")
+    assert not encrypt_password.is_valid(hashed, "wrong")
+
+
+def test_only_weaker_hashes_need_rehash(monkeypatch):
+    """
+    Hashes below the target cost are upgraded, stronger ones are kept.
+    """
+    monkeypatch.setattr(encrypt_password, "BCRYPT_ROUNDS", 5)
+    assert encrypt_password.needs_rehash(bcrypt.hashpw(b"x",
+                                                       bcrypt.gensalt(4)))
+    assert not encrypt_password.needs_rehash(bcrypt.hashpw(
+        b"x", bcrypt.gensalt(5)))
+    assert not encrypt_password.needs_rehash(bcrypt.hashpw(
+        b"x", bcrypt.gensalt(6)))
+
+
+def test_startup_calibration_keeps_the_floor(monkeypatch):
+    """
+    A budget too small for any cost still yields BCRYPT_MIN_COST.
+    """
+    monkeypatch.setenv("BCRYPT_BUDGET_MS", "0.001")
+    monkeypatch.setenv("BCRYPT_MIN_COST", "5")
+    try:
+        module = importlib.reload(encrypt_password)
+        assert module.BCRYPT_ROUNDS == 5
+    finally:
+        monkeypatch.delenv("BCRYPT_BUDGET_MS")
+        monkeypatch.delenv("BCRYPT_MIN_COST")
+        importlib.reload(encrypt_password)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for filtered_logger.export_users.
+"""
+import io
+import sqlite3
+
+import pytest
+
+from filtered_logger import export_users
+
+
+@pytest.fixture
+def db():
+    """
+    In-memory users table with five rows.
+    """
+    connection = sqlite3.connect(":memory:")
+    connection.execute(
+        "CREATE TABLE users (name TEXT, email TEXT, phone TEXT, ssn TEXT, "
+        "password TEXT, ip TEXT, user_agent TEXT)")
+    connection.executemany(
+        "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(f"user{i}", f"user{i}@example.com", f"555-010{i}",
+          f"000-00-000{i}", f"secret{i}", f"10.0.0.{i}", "curl")
+         for i in range(5)])
+    yield connection
+    connection.close()
+
+
+def test_export_users_redacts_pii(db):
+    """
+    PII columns are replaced, the others are kept.
+    """
+    out = io.StringIO()
+    export_users(db, out)
+    lines = out.getvalue().splitlines()
+    assert lines[0] == ("name=***; email=***; phone=***; ssn=***; "
+                        "password=***; ip=10.0.0.0; user_agent=curl;")
+    for i, line in enumerate(lines):
+        assert f"user{i}" not in line
+        assert f"secret{i}" not in line
+        assert f"ip=10.0.0.{i};" in line
+
+
+def test_export_users_batches_and_counts(db):
+    """
+    progress sees the running count after every batch.
+    """
+    out = io.StringIO()
+    counts = []
+    total = export_users(db, out, batch_size=2, progress=counts.append)
+    assert total == 5
+    assert counts == [2, 4, 5]
+    assert len(out.getvalue().splitlines()) == 5
+
+
+def test_export_users_empty_table(db):
+    """
+    An empty table writes nothing and never reports progress.
+    """
+    db.execute("DELETE FROM users")
+    out = io.StringIO()
+    counts = []
+    assert export_users(db, out, progress=counts.append) == 0
+    assert out.getvalue() == ""
+    assert counts == []
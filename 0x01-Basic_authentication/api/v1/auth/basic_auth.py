@@ -4,46 +4,110 @@ BasicAuth module for handling basic authentication.
 """
 
 from api.v1.auth.auth import Auth
+from api.v1.auth.credential_cache import CredentialCache
+from api.v1.auth.rate_limit import RateLimiter
 from models.user import User
+from typing import TypeVar
 import base64
+import binascii
+import os
+
+
+def _basic_payload(authorization_header: str) -> str:
+    """
+    Returns what follows the `Basic ` scheme, or None.
+    """
+    if not isinstance(authorization_header, str) or \
+            not authorization_header.startswith("Basic "):
+        return None
+    return authorization_header[6:]
+
+
+def _b64decode(payload: str) -> bytes:
+    """
+    Strictly decodes a Base64 payload, returning None if it is invalid.
+    """
+    if not isinstance(payload, str):
+        return None
+    try:
+        return base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def _split_credentials(decoded: bytes) -> (str, str):
+    """
+    Splits `email:password` bytes at the first colon and decodes both.
+    """
+    if decoded is None:
+        return None, None
+    user_email, sep, user_pwd = decoded.partition(b":")
+    if not sep:
+        return None, None
+    try:
+        return user_email.decode('utf-8'), user_pwd.decode('utf-8')
+    except UnicodeDecodeError:
+        return None, None
+
 
 class BasicAuth(Auth):
     """
     BasicAuth class for managing basic authentication.
     """
 
+    credential_cache = CredentialCache()
+    ip_limiter = RateLimiter(
+        float(os.getenv("BASIC_AUTH_RATE_LIMIT_IP_RATE", 5)),
+        float(os.getenv("BASIC_AUTH_RATE_LIMIT_IP_BURST", 20)))
+    email_limiter = RateLimiter(
+        float(os.getenv("BASIC_AUTH_RATE_LIMIT_EMAIL_RATE", 0.2)),
+        float(os.getenv("BASIC_AUTH_RATE_LIMIT_EMAIL_BURST", 5)))
+
     def extract_base64_authorization_header(self, authorization_header: str) -> str:
         """
         Extracts the Base64 part of the Authorization header.
+
+        Everything after the `Basic ` scheme is returned, as the header is
+        read by parse_authorization_header.
         """
-        if authorization_header is None or not isinstance(authorization_header, str):
-            return None
-        if not authorization_header.startswith("Basic "):
-            return None
-        return authorization_header.split(" ")[1]
+        return _basic_payload(authorization_header)
 
     def decode_base64_authorization_header(self, base64_authorization_header: str) -> str:
         """
         Decodes the Base64 part of the Authorization header.
+
+        Decoding is strict, as in parse_authorization_header: characters
+        outside the Base64 alphabet make the whole value invalid instead
+        of being skipped, so a header is never accepted here and refused
+        there.
         """
-        if base64_authorization_header is None or not isinstance(base64_authorization_header, str):
+        decoded = _b64decode(base64_authorization_header)
+        if decoded is None:
             return None
         try:
-            decoded = base64.b64decode(base64_authorization_header).decode('utf-8')
-            return decoded
-        except Exception:
+            return decoded.decode('utf-8')
+        except UnicodeDecodeError:
             return None
 
     def extract_user_credentials(self, decoded_base64_authorization_header: str) -> (str, str):
         """
         Extracts user credentials from the decoded Base64 string.
         """
-        if decoded_base64_authorization_header is None or not isinstance(decoded_base64_authorization_header, str):
-            return None, None
-        if ":" not in decoded_base64_authorization_header:
+        if not isinstance(decoded_base64_authorization_header, str):
             return None, None
-        user_credentials = decoded_base64_authorization_header.split(":", 1)
-        return user_credentials[0], user_credentials[1]
+        return _split_credentials(
+            decoded_base64_authorization_header.encode('utf-8'))
+
+    def parse_authorization_header(self, authorization_header: str) -> (str, str):
+        """
+        Extracts user credentials straight from the Authorization header.
+
+        Runs the same three steps as the methods above without the
+        intermediate strings: the Base64 payload is strictly validated and
+        split on bytes, and only the two credential strings are decoded.
+        """
+        return _split_credentials(_b64decode(_basic_payload(
+            authorization_header)))
 
     def user_object_from_credentials(self, user_email: str, user_pwd: str) -> User:
         """
@@ -67,17 +131,29 @@ class BasicAuth(Auth):
     def current_user(self, request=None) -> TypeVar('User'):
         """
         Retrieves the current user from the request.
+
+        Cached credentials are answered directly. Otherwise the client's
+        address is charged a token and the email's bucket must be
+        non-empty before the password is checked; a failed check costs
+        the email a token.
         """
         auth_header = self.authorization_header(request)
         if auth_header is None:
             return None
-        base64_auth = self.extract_base64_authorization_header(auth_header)
-        if base64_auth is None:
+        user = self.credential_cache.get(auth_header)
+        if user is not None:
+            return user
+        user_email, user_pwd = self.parse_authorization_header(auth_header)
+        if user_email is None or user_pwd is None:
             return None
-        decoded_auth = self.decode_base64_authorization_header(base64_auth)
-        if decoded_auth is None:
+        if not self.ip_limiter.hit(getattr(request, 'remote_addr', None)):
             return None
-        user_email, user_pwd = self.extract_user_credentials(decoded_auth)
-        if user_email is None or user_pwd is None:
+        email_key = user_email.strip().lower()
+        if not self.email_limiter.check(email_key):
             return None
-        return self.user_object_from_credentials(user_email, user_pwd)
+        user = self.user_object_from_credentials(user_email, user_pwd)
+        if user is not None:
+            self.credential_cache.put(auth_header, user)
+        else:
+            self.email_limiter.penalize(email_key)
+        return user
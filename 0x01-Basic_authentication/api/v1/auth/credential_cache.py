@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Short-lived cache of verified Basic credentials.
+"""
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class CredentialCache:
+    """
+    Maps an HMAC of an Authorization header to the user it verified.
+
+    Headers are never stored in clear: keys are HMAC-SHA256 digests under
+    a per-process random secret. Each entry remembers the user's id and
+    password hash; a hit is checked against the currently stored record
+    for that id, so the entry is dropped as soon as the user is removed
+    or saved with another password, through whichever instance.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None):
+        """
+        Initializes the cache, sized from BASIC_AUTH_CACHE_SIZE and
+        BASIC_AUTH_CACHE_TTL unless given. A size of 0 disables caching.
+        """
+        if max_entries is None:
+            max_entries = int(os.getenv("BASIC_AUTH_CACHE_SIZE", 10000))
+        if ttl is None:
+            ttl = float(os.getenv("BASIC_AUTH_CACHE_TTL", 30))
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._secret = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, authorization_header: str) -> bytes:
+        """
+        Returns the keyed digest used in place of the header.
+        """
+        return hmac.new(self._secret, authorization_header.encode('utf-8'),
+                        hashlib.sha256).digest()
+
+    def get(self, authorization_header: str):
+        """
+        Returns the stored user for the header, or None.
+        """
+        if self.max_entries <= 0:
+            return None
+        key = self._key(authorization_header)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user, password = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+        current = type(user).get(user.id)
+        with self._lock:
+            if current is None or \
+                    getattr(current, 'password', None) != password:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return current
+
+    def put(self, authorization_header: str, user) -> None:
+        """
+        Caches a user whose credentials were just verified.
+        """
+        if self.max_entries <= 0:
+            return
+        key = self._key(authorization_header)
+        entry = (time.monotonic() + self.ttl, user,
+                 getattr(user, 'password', None))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the cache counters.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
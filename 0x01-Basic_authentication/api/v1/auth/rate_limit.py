@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Token-bucket admission control for credential checks.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimiter:
+    """
+    Token buckets keyed by client address or email.
+
+    Buckets refill lazily from the time of their last use and are spread
+    over shards, each with its own lock and a share of max_entries. The
+    bucket idle for longest in a shard is evicted first.
+    """
+
+    def __init__(self, rate: float, burst: float,
+                 max_entries: int = None, shards: int = 64):
+        """
+        Initializes the limiter. A rate of 0 admits everything; the size
+        defaults to BASIC_AUTH_RATE_LIMIT_SIZE.
+        """
+        if max_entries is None:
+            max_entries = int(os.getenv("BASIC_AUTH_RATE_LIMIT_SIZE",
+                                        100000))
+        self.rate = rate
+        self.burst = burst
+        self.max_entries = max_entries
+        self.rejected = 0
+        self.evictions = 0
+        self._per_shard = max(1, max_entries // shards)
+        self._idle = burst / rate if rate > 0 else 0
+        self._shards = [(threading.Lock(), OrderedDict())
+                        for _ in range(shards)]
+
+    def hit(self, key) -> bool:
+        """
+        Takes one token from the key's bucket, False if it was empty.
+        """
+        return self._take(key, 1, 1)
+
+    def check(self, key) -> bool:
+        """
+        Returns False if the key's bucket is empty, without taking.
+        """
+        return self._take(key, 0, 1)
+
+    def penalize(self, key, cost: float = 1) -> None:
+        """
+        Takes up to cost tokens from the key's bucket.
+        """
+        self._take(key, cost, 0)
+
+    def _take(self, key, cost: float, need: float) -> bool:
+        """
+        Refills the key's bucket, then takes cost tokens if it holds need.
+        """
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        lock, buckets = self._shards[hash(key) % len(self._shards)]
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                tokens = self.burst
+                self._evict(buckets, now)
+            else:
+                tokens = min(self.burst,
+                             bucket[0] + (now - bucket[1]) * self.rate)
+                buckets.move_to_end(key)
+            if tokens < need:
+                buckets[key] = (tokens, now)
+                self.rejected += 1
+                return False
+            buckets[key] = (max(0.0, tokens - cost), now)
+            return True
+
+    def _evict(self, buckets: OrderedDict, now: float) -> None:
+        """
+        Drops refilled buckets, then the idlest ones while the shard is
+        full. Buckets are kept in order of last use.
+        """
+        while buckets:
+            key, (_, stamp) = next(iter(buckets.items()))
+            if now - stamp < self._idle:
+                break
+            del buckets[key]
+        while len(buckets) >= self._per_shard:
+            buckets.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Basic authentication API.
+
+    ./benchmark.py cache     BasicAuth.current_user requests/s with the
+                             credential cache on and off
+    ./benchmark.py auth      Auth.require_auth calls/s against the number
+                             of excluded-path rules
+    ./benchmark.py search    User.search latency on a store of 1M users,
+                             by indexed and unindexed attributes
+    ./benchmark.py store     startup time, save latency and compaction
+                             time of the log-backed store at 1M users
+    ./benchmark.py parse     Authorization header parsing calls/s for
+                             well-formed and malformed headers
+
+Each run works on a throwaway model store in a temporary directory.
+"""
+
+import argparse
+import base64
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+
+class FakeRequest:
+    """
+    The parts of a Flask request that the auth classes read.
+    """
+
+    def __init__(self, authorization: Optional[str] = None,
+                 remote_addr: str = "127.0.0.1"):
+        """
+        Initializes a request carrying the given Authorization header.
+        """
+        self.headers = {}
+        if authorization is not None:
+            self.headers['Authorization'] = authorization
+        self.remote_addr = remote_addr
+
+
+def basic_header(email: str, pwd: str) -> str:
+    """
+    Returns the Basic Authorization header for email and pwd.
+    """
+    token = base64.b64encode(f"{email}:{pwd}".encode('utf-8'))
+    return "Basic " + token.decode('ascii')
+
+
+def create_users(total: int) -> List[str]:
+    """
+    Saves total users with password "pwd" and returns their emails.
+    """
+    from models.user import User
+
+    emails = []
+    for i in range(total):
+        user = User(email=f"user{i}@example.com")
+        user.password = "pwd"
+        user.save()
+        emails.append(user.email)
+    return emails
+
+
+def populate(total: int, password: Optional[str] = None) -> float:
+    """
+    Saves total users, without a password unless given, and returns the
+    seconds it took.
+    """
+    from models.user import User
+
+    start = time.perf_counter()
+    for i in range(total):
+        user = User(email=f"user{i}@example.com", first_name=f"first{i}",
+                    last_name=f"last{i % 1000}")
+        if password is not None:
+            user.password = password
+        user.save()
+    return time.perf_counter() - start
+
+
+def latency_us(fn: Callable[[int], object], keys: List[int]) -> List[float]:
+    """
+    Returns the latency of fn(key) for each key, in microseconds.
+    """
+    durations = []
+    for key in keys:
+        start = time.perf_counter()
+        fn(key)
+        durations.append((time.perf_counter() - start) * 1e6)
+    return durations
+
+
+def calls_per_second(fn: Callable[[], object], seconds: float) -> float:
+    """
+    Calls fn() repeatedly for about seconds and returns calls/s.
+    """
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        for _ in range(100):
+            fn()
+        count += 100
+        now = time.perf_counter()
+        if now >= deadline:
+            return count / (now - start)
+
+
+def bench_cache(users: int, seconds: float) -> None:
+    """
+    Prints current_user requests/s with the cache on and off.
+
+    Requests cycle through every user's header. Both rate limiters are
+    disabled so the uncached path measures only the credential check.
+    """
+    from api.v1.auth.basic_auth import BasicAuth
+    from api.v1.auth.credential_cache import CredentialCache
+    from api.v1.auth.rate_limit import RateLimiter
+
+    requests = [FakeRequest(basic_header(email, "pwd"))
+                for email in create_users(users)]
+    auth = BasicAuth()
+    auth.ip_limiter = RateLimiter(0, 0)
+    auth.email_limiter = RateLimiter(0, 0)
+    position = [0]
+
+    def one_request():
+        request = requests[position[0] % len(requests)]
+        position[0] += 1
+        if auth.current_user(request) is None:
+            raise RuntimeError("request was not authenticated")
+
+    print(f"{'cache':>5} {'req/s':>10}")
+    results = {}
+    for label, size in (("off", 0), ("on", max(users, 1))):
+        auth.credential_cache = CredentialCache(max_entries=size, ttl=3600)
+        results[label] = calls_per_second(one_request, seconds)
+        print(f"{label:>5} {results[label]:>10,.0f}")
+    print(f"speedup {results['on'] / results['off']:.1f}x")
+
+
+def bench_require_auth(rule_counts: List[int], seconds: float) -> None:
+    """
+    Prints require_auth calls/s for each number of excluded paths.
+
+    Rules are a mix of exact paths and trailing-wildcard prefixes; the
+    checked paths cycle through matching and non-matching ones so the
+    per-path memo is exercised as it would be by a real client mix.
+    """
+    from api.v1.auth.auth import Auth
+
+    print(f"{'rules':>6} {'calls/s':>12} {'us/call':>8}")
+    for count in rule_counts:
+        rules = ["/api/v1/status/", "/api/v1/unauthorized/",
+                 "/api/v1/forbidden/"]
+        rules += [f"/api/v1/public{i}/" if i % 2 else f"/api/v1/static{i}*"
+                  for i in range(max(0, count - len(rules)))]
+        rules = rules[:count]
+        paths = ["/api/v1/status", "/api/v1/users", "/api/v1/users/me",
+                 "/api/v1/stats"] + [f"/api/v1/static{i}/app.js"
+                                     for i in range(0, count, 2)][:12]
+        auth = Auth()
+        position = [0]
+
+        def one_call():
+            auth.require_auth(paths[position[0] % len(paths)], rules)
+            position[0] += 1
+
+        rate = calls_per_second(one_call, seconds)
+        print(f"{count:>6} {rate:>12,.0f} {1e6 / rate:>8.2f}")
+
+
+def bench_search(users: int, lookups: int) -> None:
+    """
+    Prints User.search latency by email, by id and by an unindexed field.
+
+    Lookups by email go through the hash index; the first lookup of a
+    user decodes it from the log (cold), a repeat finds it in memory
+    (warm). A search on first_name has no index and scans every user.
+    """
+    from models import base
+    from models.user import User
+
+    print(f"saving {users:,} users took {populate(users):.1f}s")
+    ids = list(base.DATA["User"])
+    keys = random.Random(0).sample(range(users), min(lookups, users))
+
+    def by_email(i):
+        assert User.search({'email': f"user{i}@example.com"})
+
+    def by_id(i):
+        assert User.search({'id': ids[i]})
+
+    base.DATA.clear()
+    User.load_from_file()
+    print(f"{'search':>18} {'p50 us':>10} {'p99 us':>10}")
+    for label, fn in (("email (cold)", by_email), ("email (warm)", by_email),
+                      ("id (warm)", by_id)):
+        durations = sorted(latency_us(fn, keys))
+        print(f"{label:>18} {statistics.median(durations):>10.1f} "
+              f"{durations[int(len(durations) * 0.99) - 1]:>10.1f}")
+    start = time.perf_counter()
+    User.search({'first_name': f"first{users - 1}"})
+    print(f"{'first_name (scan)':>18} "
+          f"{(time.perf_counter() - start) * 1e6:>10.1f}")
+
+
+def bench_parse(seconds: float, garbage_kb: int) -> None:
+    """
+    Prints parsing calls/s per kind of header, for the fused
+    parse_authorization_header and for the extract, decode and split
+    steps called one after the other.
+    """
+    from api.v1.auth.basic_auth import BasicAuth
+
+    auth = BasicAuth()
+    valid = basic_header("bob@example.com", "correct horse battery")
+    headers = [
+        ("valid", valid),
+        ("other scheme", "Bearer " + valid[6:]),
+        ("bad base64", valid[:-4] + "!!!!"),
+        ("no colon", "Basic " + base64.b64encode(b"bob").decode()),
+        ("not utf-8", "Basic " + base64.b64encode(b"\xff:\xfe").decode()),
+        ("empty", "Basic "),
+        (f"{garbage_kb} KiB junk", "Basic " + "A!" * (garbage_kb * 512)),
+    ]
+
+    def steps(header):
+        payload = auth.extract_base64_authorization_header(header)
+        decoded = auth.decode_base64_authorization_header(payload)
+        return auth.extract_user_credentials(decoded)
+
+    print(f"{'header':>14} {'fused/s':>12} {'steps/s':>12}")
+    for label, header in headers:
+        fused = calls_per_second(
+            lambda: auth.parse_authorization_header(header), seconds)
+        chained = calls_per_second(lambda: steps(header), seconds)
+        print(f"{label:>14} {fused:>12,.0f} {chained:>12,.0f}")
+
+
+def restart() -> None:
+    """
+    Forgets the in-memory store, as a new process would.
+    """
+    from models import base
+
+    for log in base.STORES.values():
+        log.close()
+    base.DATA.clear()
+    base.INDEXES.clear()
+    base.STORES.clear()
+
+
+def bench_store(users: int, saves: int) -> None:
+    """
+    Prints how long a store of users takes to load and to compact, and
+    the latency of saving updates to existing users.
+    """
+    from models.user import User
+
+    print(f"saving {users:,} users took {populate(users):.1f}s "
+          f"({os.path.getsize('.db_User.log') / 1e6:,.0f} MB log)")
+    restart()
+    start = time.perf_counter()
+    User.count()
+    print(f"startup (index scan) {time.perf_counter() - start:.2f}s")
+
+    ids = list(User._records())
+    keys = random.Random(0).sample(range(users), min(saves, users))
+
+    def update(i):
+        user = User.get(ids[i])
+        user.last_name = "updated"
+        user.save()
+
+    durations = sorted(latency_us(update, keys))
+    print(f"save p50 {statistics.median(durations):.1f}us "
+          f"p99 {durations[int(len(durations) * 0.99) - 1]:.1f}us "
+          f"max {durations[-1]:.1f}us")
+    start = time.perf_counter()
+    User.save_to_file()
+    print(f"compaction {time.perf_counter() - start:.2f}s")
+    restart()
+    start = time.perf_counter()
+    User.count()
+    print(f"startup after compaction {time.perf_counter() - start:.2f}s")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cache = commands.add_parser("cache", help="credential cache on/off")
+    cache.add_argument("--users", type=int, default=1000,
+                       help="users cycled through (default: 1000)")
+    cache.add_argument("--seconds", type=float, default=2.0,
+                       help="time per measurement (default: 2)")
+
+    auth = commands.add_parser("auth", help="require_auth calls/s")
+    auth.add_argument("--rules", default="3,10,100,1000",
+                      help="excluded path counts (default: 3,10,100,1000)")
+    auth.add_argument("--seconds", type=float, default=1.0,
+                      help="time per measurement (default: 1)")
+
+    search = commands.add_parser("search", help="User.search latency")
+    search.add_argument("--users", type=int, default=1000000,
+                        help="users in the store (default: 1000000)")
+    search.add_argument("--lookups", type=int, default=2000,
+                        help="searches per measurement (default: 2000)")
+
+    store = commands.add_parser("store", help="startup and save latency")
+    store.add_argument("--users", type=int, default=1000000,
+                       help="users in the store (default: 1000000)")
+    store.add_argument("--saves", type=int, default=2000,
+                       help="updates timed (default: 2000)")
+
+    parse = commands.add_parser("parse", help="header parsing calls/s")
+    parse.add_argument("--seconds", type=float, default=0.5,
+                       help="time per measurement (default: 0.5)")
+    parse.add_argument("--junk-kb", type=int, default=8,
+                       help="size of the junk header in KiB (default: 8)")
+
+    args = parser.parse_args(argv)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        if args.command == "cache":
+            bench_cache(args.users, args.seconds)
+        elif args.command == "auth":
+            bench_require_auth([int(n) for n in args.rules.split(",")],
+                               args.seconds)
+        elif args.command == "search":
+            bench_search(args.users, args.lookups)
+        elif args.command == "store":
+            bench_store(args.users, args.saves)
+        elif args.command == "parse":
+            bench_parse(args.seconds, args.junk_kb)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
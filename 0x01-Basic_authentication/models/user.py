@@ -4,6 +4,8 @@ User model module.
 """
 
 from models.base import Base
+import hashlib
+import hmac
 
 class User(Base):
     """
@@ -14,15 +16,48 @@ class User(Base):
     first_name: str
     last_name: str
 
-    def is_valid_password(self, pwd: str) -> bool:
+    __indexed__ = ('email',)
+
+    def __init__(self, *args: list, **kwargs: dict):
+        """
+        Initializes a User, restoring stored attributes from kwargs.
+
+        A stored `_password` hash is kept as is; a clear `password` (as
+        written by older versions of the store) is hashed.
+        """
+        super().__init__(*args, **kwargs)
+        self.email = kwargs.get('email')
+        if '_password' in kwargs:
+            self._password = kwargs.get('_password')
+        else:
+            self.password = kwargs.get('password')
+        self.first_name = kwargs.get('first_name')
+        self.last_name = kwargs.get('last_name')
+
+    @property
+    def password(self) -> str:
         """
-        Checks if the password is valid.
+        Returns the SHA256 hex digest of the password.
         """
-        return True  # replace with actual password checking logic
+        return self._password
 
-    @classmethod
-    def search(cls, filters: dict):
+    @password.setter
+    def password(self, pwd: str):
+        """
+        Stores the SHA256 hex digest of pwd, never pwd itself.
+        """
+        if pwd is None or not isinstance(pwd, str):
+            self._password = None
+        else:
+            self._password = hashlib.sha256(pwd.encode()).hexdigest().lower()
+
+    def is_valid_password(self, pwd: str) -> bool:
         """
-        Simulates a search method for finding users.
+        Checks pwd against the stored password hash.
         """
-        return []
+        if pwd is None or not isinstance(pwd, str):
+            return False
+        if self.password is None:
+            return False
+        digest = hashlib.sha256(pwd.encode()).hexdigest().lower()
+        return hmac.compare_digest(digest, self.password)
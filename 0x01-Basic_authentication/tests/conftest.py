@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Shared pytest setup: import the packages and give each test its own store.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """
+    Runs the test in tmp_path with empty model globals.
+    """
+    from models import base
+
+    def reset():
+        for log in base.STORES.values():
+            log.close()
+        base.DATA.clear()
+        base.INDEXES.clear()
+        base.STORES.clear()
+
+    reset()
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    reset()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Tests for Basic Authorization header parsing.
+"""
+import base64
+
+import pytest
+
+from api.v1.auth.basic_auth import BasicAuth
+
+HEADERS = [
+    None, 89, "", "Basic", "Basic ", "Bearer abc", "basic Ym9iOnB3",
+    "Basic Ym9iOnB3", "Basic Ym9iOnB3ZDpzZWNyZXQ=", "Basic Ym9i",
+    "Basic Ym9iOnB3!!", "Basic Ym9i OnB3", "Basic  Ym9iOnB3",
+    "Basic " + base64.b64encode(b"\xff\xfe:pw").decode(),
+    "Basic " + base64.b64encode(b"b\xc3\xb6b:p\xc3\xa5").decode(),
+    "Basic " + base64.b64encode(b":").decode(),
+]
+
+
+@pytest.mark.parametrize("header", HEADERS)
+def test_steps_agree_with_fused_parser(header):
+    """
+    extract, decode and split give the same answer as the fused parser.
+    """
+    auth = BasicAuth()
+    payload = auth.extract_base64_authorization_header(header)
+    decoded = auth.decode_base64_authorization_header(payload)
+    assert auth.extract_user_credentials(decoded) == \
+        auth.parse_authorization_header(header)
+
+
+def test_fused_parser_results():
+    """
+    Well-formed headers split at the first colon; the rest are refused.
+    """
+    auth = BasicAuth()
+    assert auth.parse_authorization_header("Basic Ym9iOnB3ZDpzZWNyZXQ=") \
+        == ("bob", "pwd:secret")
+    assert auth.parse_authorization_header(HEADERS[-2]) == ("böb", "på")
+    for header in ("Basic Ym9i", "Basic Ym9iOnB3!!", HEADERS[-3], None):
+        assert auth.parse_authorization_header(header) == (None, None)
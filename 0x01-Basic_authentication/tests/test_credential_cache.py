@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the cache of verified Basic credentials.
+"""
+import base64
+
+from api.v1.auth.credential_cache import CredentialCache
+from models.user import User
+
+
+def header(email: str, pwd: str) -> str:
+    """
+    Basic Authorization header for email and pwd.
+    """
+    token = base64.b64encode(f"{email}:{pwd}".encode()).decode()
+    return f"Basic {token}"
+
+
+def make_user(email: str, pwd: str) -> User:
+    """
+    Saves and returns a new user.
+    """
+    user = User(email=email)
+    user.password = pwd
+    user.save()
+    return user
+
+
+def test_hit_returns_the_stored_user(store):
+    """
+    A cached header answers with the user currently stored under its id.
+    """
+    cache = CredentialCache(max_entries=10, ttl=60)
+    user = make_user("a@x.com", "old")
+    cache.put(header("a@x.com", "old"), user)
+    assert cache.get(header("a@x.com", "old")) is user
+    assert cache.stats()["hits"] == 1
+
+
+def test_password_saved_through_another_instance_invalidates(store):
+    """
+    Saving the same id through a new object with a new password drops
+    the entry, even though the cached object itself is unchanged.
+    """
+    cache = CredentialCache(max_entries=10, ttl=60)
+    user = make_user("a@x.com", "old")
+    cache.put(header("a@x.com", "old"), user)
+    replacement = User(id=user.id, email="a@x.com")
+    replacement.password = "new"
+    replacement.save()
+    assert cache.get(header("a@x.com", "old")) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_removed_user_invalidates(store):
+    """
+    A removed user is never answered from the cache.
+    """
+    cache = CredentialCache(max_entries=10, ttl=60)
+    user = make_user("a@x.com", "pw")
+    cache.put(header("a@x.com", "pw"), user)
+    user.remove()
+    assert cache.get(header("a@x.com", "pw")) is None
+
+
+def test_disabled_cache(store):
+    """
+    A size of 0 caches nothing.
+    """
+    cache = CredentialCache(max_entries=0)
+    user = make_user("a@x.com", "pw")
+    cache.put(header("a@x.com", "pw"), user)
+    assert cache.get(header("a@x.com", "pw")) is None
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Crash-consistency tests for the log-backed model store.
+"""
+import os
+
+from models import base
+from models.user import User
+
+
+def restart():
+    """
+    Forgets everything in memory, as a new process would.
+    """
+    for log in base.STORES.values():
+        log.close()
+    base.DATA.clear()
+    base.INDEXES.clear()
+    base.STORES.clear()
+
+
+def make_user(email: str) -> User:
+    """
+    Saves and returns a new user.
+    """
+    user = User(email=email)
+    user.password = "pwd"
+    user.save()
+    return user
+
+
+def tear_last_line(log_path) -> None:
+    """
+    Cuts the log in the middle of its last line, as a crash during the
+    append would.
+    """
+    size = os.path.getsize(log_path)
+    with open(log_path, 'rb') as f:
+        last = f.readlines()[-1]
+    with open(log_path, 'r+b') as f:
+        f.truncate(size - len(last) // 2)
+
+
+def assert_consistent(expected: dict) -> None:
+    """
+    Checks records and the email index against {id: email}.
+    """
+    assert User.count() == len(expected)
+    index = base.INDEXES["User"]["email"]
+    assert {email: set(ids) for email, ids in index.items()} == \
+        {email: {obj_id} for obj_id, email in expected.items()}
+    for obj_id, email in expected.items():
+        user = User.get(obj_id)
+        assert user.email == email
+        assert user.is_valid_password("pwd")
+        assert [found.id for found in User.search({'email': email})] == \
+            [obj_id]
+
+
+def test_torn_last_line_is_dropped_on_reload(store):
+    """
+    Live records and indexes survive a crash in the middle of an append.
+    """
+    a, b, c = (make_user(f"{name}@x.com") for name in "abc")
+    b.email = "b2@x.com"
+    b.save()
+    c.remove()
+    make_user("torn@x.com")
+    log_path = store / ".db_User.log"
+    tear_last_line(log_path)
+
+    restart()
+    assert_consistent({a.id: "a@x.com", b.id: "b2@x.com"})
+    assert User.search({'email': "torn@x.com"}) == []
+    assert User.search({'email': "b@x.com"}) == []
+    assert log_path.read_bytes().endswith(b'\n')
+
+    d = make_user("d@x.com")
+    restart()
+    assert_consistent({a.id: "a@x.com", b.id: "b2@x.com", d.id: "d@x.com"})
+
+
+def test_compaction_then_torn_line(store, monkeypatch):
+    """
+    Compaction keeps exactly the live records, and a crash after it, or
+    during it, loses nothing that was saved before.
+    """
+    monkeypatch.setattr(base, "COMPACT_MIN_RECORDS", 0)
+    users = [make_user(f"user{i}@x.com") for i in range(5)]
+    for round_ in range(3):
+        for user in users:
+            user.email = f"user{user.id[:8]}-{round_}@x.com"
+            user.save()
+    users[0].remove()
+    expected = {user.id: user.email for user in users[1:]}
+    log_path = store / ".db_User.log"
+    assert base.STORES["User"].records < 3 * len(users)
+
+    User.save_to_file()
+    assert len(log_path.read_bytes().splitlines()) == len(expected)
+    assert_consistent(expected)
+
+    extra = make_user("extra@x.com")
+    tear_last_line(log_path)
+    restart()
+    assert_consistent(expected)
+    assert User.get(extra.id) is None
+
+    (store / ".db_User.log.tmp").write_bytes(b"P\tpartial")
+    restart()
+    assert_consistent(expected)
+    User.save_to_file()
+    restart()
+    assert_consistent(expected)
+    assert not (store / ".db_User.log.tmp").exists()
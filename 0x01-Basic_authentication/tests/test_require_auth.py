@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests for Auth.require_auth and its compiled excluded-path rules.
+"""
+from api.v1.auth.auth import Auth
+
+
+def test_changed_rules_are_recompiled():
+    """
+    A different list takes effect at once, and so does a list edited in
+    place once set_excluded_paths is called.
+    """
+    auth = Auth()
+    excluded = ["/api/v1/status/"]
+    assert not auth.require_auth("/api/v1/status", excluded)
+    assert auth.require_auth("/api/v1/stats", excluded)
+    replaced = ["/api/v1/stats/"]
+    assert auth.require_auth("/api/v1/status", replaced)
+    assert not auth.require_auth("/api/v1/stats", replaced)
+    excluded[0] = "/api/v1/users/"
+    auth.set_excluded_paths(excluded)
+    assert auth.require_auth("/api/v1/stats", excluded)
+    assert not auth.require_auth("/api/v1/users", excluded)
+
+
+def test_equal_lists_share_one_matcher():
+    """
+    A fresh list with the same rules, as built per request, is not
+    compiled again.
+    """
+    auth = Auth()
+    auth.require_auth("/api/v1/status", ["/api/v1/status/"])
+    matcher = auth._compiled[2]
+    auth.require_auth("/api/v1/users", ["/api/v1/status/"])
+    assert auth._compiled[2] is matcher
+
+
+def test_wildcards_and_trailing_slash():
+    """
+    Exact rules tolerate a missing trailing slash; `*` matches any run.
+    """
+    auth = Auth()
+    excluded = ["/api/v1/status/", "/api/v1/stat*", "/api/*/forbidden/"]
+    assert not auth.require_auth("/api/v1/status", excluded)
+    assert not auth.require_auth("/api/v1/stats", excluded)
+    assert not auth.require_auth("/api/v2/forbidden/", excluded)
+    assert auth.require_auth("/api/v1/users", excluded)
+    assert auth.require_auth(None, excluded)
+    assert auth.require_auth("/api/v1/status", [])
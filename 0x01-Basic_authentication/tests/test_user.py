@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the User model and Basic credential checks.
+"""
+import base64
+
+from api.v1.auth.basic_auth import BasicAuth
+from api.v1.auth.credential_cache import CredentialCache
+from models.user import User
+
+
+class Request:
+    """
+    Minimal request carrying an Authorization header.
+    """
+
+    def __init__(self, email: str, pwd: str):
+        token = base64.b64encode(f"{email}:{pwd}".encode()).decode()
+        self.headers = {'Authorization': f"Basic {token}"}
+        self.remote_addr = "127.0.0.1"
+
+
+def test_password_is_stored_hashed(store):
+    """
+    Only the hash is kept and written to the log.
+    """
+    user = User(email="a@x.com")
+    user.password = "secret"
+    user.save()
+    assert user.password != "secret"
+    assert "secret" not in (store / ".db_User.log").read_text()
+
+
+def test_wrong_password_is_rejected(store):
+    """
+    is_valid_password accepts the right password only.
+    """
+    user = User(email="a@x.com")
+    user.password = "secret"
+    assert user.is_valid_password("secret")
+    assert not user.is_valid_password("wrong")
+    assert not user.is_valid_password("")
+    assert not user.is_valid_password(None)
+    assert not User(email="b@x.com").is_valid_password("secret")
+
+
+def test_password_survives_reload(store):
+    """
+    A user decoded from the log keeps the hash, not a hash of the hash.
+    """
+    from models import base
+
+    user = User(email="a@x.com")
+    user.password = "secret"
+    user.save()
+    base.DATA.clear()
+    loaded = User.get(user.id)
+    assert loaded is not user
+    assert loaded.is_valid_password("secret")
+    assert not loaded.is_valid_password("wrong")
+
+
+def test_basic_auth_rejects_wrong_password(store, monkeypatch):
+    """
+    current_user refuses a known email with the wrong password.
+    """
+    monkeypatch.setattr(BasicAuth, "credential_cache",
+                        CredentialCache(max_entries=10))
+    user = User(email="a@x.com")
+    user.password = "secret"
+    user.save()
+    auth = BasicAuth()
+    assert auth.current_user(Request("a@x.com", "wrong")) is None
+    assert auth.current_user(Request("a@x.com", "secret")) == user
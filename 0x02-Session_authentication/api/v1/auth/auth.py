@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Auth module for handling authentication.
+"""
+
+import os
+import re
+from typing import List, TypeVar
+
+
+class PathMatcher:
+    """
+    Excluded-path rules compiled once for repeated matching.
+
+    A rule matches a path exactly, or with the path's trailing slash
+    added. A rule ending in `*` matches every path starting with what
+    precedes it, through a character trie, so a lookup costs the length
+    of the path rather than the number of rules. A `*` elsewhere in a
+    rule matches any run of characters. Results are memoized per path.
+    """
+
+    CACHE_SIZE = 4096
+
+    def __init__(self, excluded_paths: List[str]):
+        """
+        Compiles the rules.
+        """
+        self.exact = set()
+        self.prefixes = {}
+        patterns = []
+        for rule in excluded_paths:
+            if "*" not in rule:
+                self.exact.add(rule)
+            elif rule.index("*") == len(rule) - 1:
+                node = self.prefixes
+                for char in rule[:-1]:
+                    node = node.setdefault(char, {})
+                node[None] = True
+            else:
+                patterns.append(".*".join(map(re.escape, rule.split("*"))))
+        self.pattern = re.compile("|".join(patterns)) if patterns else None
+        self._cache = {}
+
+    def match(self, path: str) -> bool:
+        """
+        Returns True if path is covered by one of the rules.
+        """
+        matched = self._cache.get(path)
+        if matched is None:
+            matched = self._match(path)
+            if len(self._cache) >= self.CACHE_SIZE:
+                self._cache.clear()
+            self._cache[path] = matched
+        return matched
+
+    def _match(self, path: str) -> bool:
+        """
+        Uncached lookup.
+        """
+        if path in self.exact or f"{path}/" in self.exact:
+            return True
+        node = self.prefixes
+        for char in path:
+            if None in node:
+                return True
+            node = node.get(char)
+            if node is None:
+                break
+        else:
+            if None in node:
+                return True
+        if self.pattern is not None:
+            return self.pattern.fullmatch(path) is not None
+        return False
+
+
+class Auth:
+    """
+    Auth class for managing authentication.
+    """
+
+    _compiled = (None, (), None)
+
+    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
+        """
+        Determines if a path requires authentication.
+        """
+        if path is None or excluded_paths is None or len(excluded_paths) == 0:
+            return True
+        return not self._excluded_matcher(excluded_paths).match(path)
+
+    def set_excluded_paths(self, excluded_paths: List[str]) -> None:
+        """
+        Compiles excluded_paths for the following require_auth calls.
+
+        Call it again after editing the same list in place; passing a
+        different list is noticed on its own.
+        """
+        rules = tuple(excluded_paths)
+        self._compiled = (excluded_paths, rules, PathMatcher(rules))
+
+    def _excluded_matcher(self, excluded_paths: List[str]) -> PathMatcher:
+        """
+        Returns the PathMatcher for excluded_paths.
+
+        The list last compiled is recognised by identity, so a request
+        costs the same whatever the number of rules. Another list is
+        compared by content before being compiled.
+        """
+        source, rules, matcher = self._compiled
+        if source is not excluded_paths:
+            if tuple(excluded_paths) == rules:
+                self._compiled = (excluded_paths, rules, matcher)
+            else:
+                self.set_excluded_paths(excluded_paths)
+                matcher = self._compiled[2]
+        return matcher
+
+    def authorization_header(self, request=None) -> str:
+        """
+        Retrieves the authorization header from the request.
+        """
+        if request is None:
+            return None
+        return request.headers.get('Authorization')
+
+    def current_user(self, request=None) -> TypeVar('User'):
+        """
+        Retrieves the current user from the request.
+        """
+        return None
+
+    def session_cookie(self, request=None) -> str:
+        """
+        Retrieves the session cookie named by SESSION_NAME from the request.
+        """
+        if request is None:
+            return None
+        return request.cookies.get(os.getenv('SESSION_NAME'))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+SessionAuth module for handling session authentication.
+"""
+
+from api.v1.auth.auth import Auth
+from api.v1.auth.session_store import SessionStore, session_store_from_env
+from models.user import User
+from typing import TypeVar
+from uuid import uuid4
+import os
+
+
+class SessionAuth(Auth):
+    """
+    SessionAuth class for managing session authentication.
+
+    Session IDs are kept in a pluggable SessionStore chosen by
+    SESSION_STORE; sessions expire after SESSION_DURATION seconds
+    (0 or unset keeps them until logout).
+    """
+
+    def __init__(self, store: SessionStore = None):
+        """
+        Initializes SessionAuth with the given or configured store.
+        """
+        self.store = store if store is not None else session_store_from_env()
+        try:
+            self.session_duration = int(os.getenv('SESSION_DURATION', 0))
+        except ValueError:
+            self.session_duration = 0
+
+    def create_session(self, user_id: str = None) -> str:
+        """
+        Creates a session ID for a user ID.
+        """
+        if user_id is None or not isinstance(user_id, str):
+            return None
+        session_id = str(uuid4())
+        self.store.set(session_id, user_id, self.session_duration)
+        return session_id
+
+    def user_id_for_session_id(self, session_id: str = None) -> str:
+        """
+        Returns the user ID bound to a session ID.
+        """
+        if session_id is None or not isinstance(session_id, str):
+            return None
+        return self.store.get(session_id)
+
+    def current_user(self, request=None) -> TypeVar('User'):
+        """
+        Retrieves the current user from the session cookie.
+        """
+        user_id = self.user_id_for_session_id(self.session_cookie(request))
+        if user_id is None:
+            return None
+        return User.get(user_id)
+
+    def destroy_session(self, request=None) -> bool:
+        """
+        Deletes the session of the request, logging the user out.
+        """
+        session_id = self.session_cookie(request)
+        if session_id is None:
+            return False
+        return self.store.delete(session_id)
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Session storage backends for SessionAuth.
+"""
+
+from abc import ABC, abstractmethod
+import heapq
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+
+class SessionStore(ABC):
+    """
+    Interface for mapping session IDs to user IDs with an optional TTL.
+
+    A ttl of 0 or less means the session never expires.
+    """
+
+    @abstractmethod
+    def set(self, session_id: str, user_id: str, ttl: int = 0) -> None:
+        """
+        Stores user_id under session_id.
+        """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[str]:
+        """
+        Returns the user ID for a live session_id, or None.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """
+        Removes session_id, returning whether it existed.
+        """
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process store with a heap of expiry times.
+
+    Lookups are a dict access plus an expiry comparison. Expired sessions
+    are reclaimed by popping the heap, a few at a time on every write and
+    fully by sweep(), instead of scanning all sessions. Any call runs
+    sweep() at most once per SWEEP_INTERVAL seconds, so expired sessions
+    are reclaimed even when nothing new is written.
+    """
+
+    SWEEP_INTERVAL = 60
+    SWEEP_BATCH = 64
+
+    def __init__(self):
+        """
+        Initializes an empty store.
+        """
+        self._sessions = {}
+        self._expiries = []
+        self._lock = threading.Lock()
+        self._next_sweep = 0
+
+    def set(self, session_id: str, user_id: str, ttl: int = 0) -> None:
+        """
+        Stores user_id under session_id.
+        """
+        now = time.monotonic()
+        expires_at = now + ttl if ttl > 0 else None
+        with self._lock:
+            self._sessions[session_id] = (user_id, expires_at)
+            if expires_at is not None:
+                heapq.heappush(self._expiries, (expires_at, session_id))
+            self._sweep(now, self.SWEEP_BATCH)
+        self._maybe_sweep(now)
+
+    def get(self, session_id: str) -> Optional[str]:
+        """
+        Returns the user ID for a live session_id, or None.
+        """
+        now = time.monotonic()
+        self._maybe_sweep(now)
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        user_id, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            return None
+        return user_id
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Removes session_id, returning whether it existed.
+        """
+        self._maybe_sweep(time.monotonic())
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def sweep(self) -> None:
+        """
+        Drops every expired session.
+        """
+        with self._lock:
+            self._sweep(time.monotonic(), None)
+
+    def _maybe_sweep(self, now: float) -> None:
+        """
+        Runs sweep() if SWEEP_INTERVAL has passed since the last one.
+        """
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.SWEEP_INTERVAL
+            self.sweep()
+
+    def _sweep(self, now: float, limit: Optional[int]) -> None:
+        """
+        Pops up to limit expired heap entries, caller must hold the lock.
+        """
+        expiries = self._expiries
+        while expiries and expiries[0][0] <= now and limit != 0:
+            expires_at, session_id = heapq.heappop(expiries)
+            entry = self._sessions.get(session_id)
+            if entry is not None and entry[1] == expires_at:
+                del self._sessions[session_id]
+            if limit is not None:
+                limit -= 1
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite-backed store that several worker processes can share.
+
+    Sessions are keyed by primary key and expiry is indexed, so sweeping
+    deletes expired rows in small batches without scanning the table.
+    """
+
+    SWEEP_INTERVAL = 60
+    SWEEP_BATCH = 500
+
+    def __init__(self, file_path: str):
+        """
+        Opens (and creates if needed) the sessions database at file_path.
+        """
+        self.file_path = file_path
+        self._local = threading.local()
+        self._next_sweep = 0
+        db = self._db()
+        db.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                   "session_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, "
+                   "expires_at REAL)")
+        db.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at "
+                   "ON sessions (expires_at)")
+
+    def _db(self) -> sqlite3.Connection:
+        """
+        Returns the calling thread's connection.
+        """
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.file_path, timeout=5,
+                                 isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def set(self, session_id: str, user_id: str, ttl: int = 0) -> None:
+        """
+        Stores user_id under session_id.
+        """
+        now = time.time()
+        expires_at = now + ttl if ttl > 0 else None
+        self._db().execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+            (session_id, user_id, expires_at))
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.SWEEP_INTERVAL
+            self.sweep()
+
+    def get(self, session_id: str) -> Optional[str]:
+        """
+        Returns the user ID for a live session_id, or None.
+        """
+        row = self._db().execute(
+            "SELECT user_id FROM sessions WHERE session_id = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (session_id, time.time())).fetchone()
+        return row[0] if row else None
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Removes session_id, returning whether it existed.
+        """
+        cursor = self._db().execute(
+            "DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        return cursor.rowcount > 0
+
+    def sweep(self) -> None:
+        """
+        Deletes expired sessions, SWEEP_BATCH rows per transaction.
+        """
+        db = self._db()
+        while True:
+            cursor = db.execute(
+                "DELETE FROM sessions WHERE session_id IN ("
+                "SELECT session_id FROM sessions WHERE expires_at <= ? "
+                "LIMIT ?)", (time.time(), self.SWEEP_BATCH))
+            if cursor.rowcount < self.SWEEP_BATCH:
+                return
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Store speaking the Redis protocol (RESP) over TCP or a Unix socket.
+
+    Expiry is delegated to the server (SET ... EX), so any server that
+    implements GET, SET and DEL can back sessions shared by all workers.
+    """
+
+    PREFIX = "session:"
+
+    def __init__(self, url: str):
+        """
+        Records the server address, `redis://host:port` or `unix:///path`.
+        """
+        self.url = urlparse(url)
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> None:
+        """
+        Opens the connection to the server.
+        """
+        if self.url.scheme == 'unix':
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.url.path)
+        else:
+            sock = socket.create_connection(
+                (self.url.hostname or 'localhost', self.url.port or 6379))
+        self._sock = sock
+        self._reader = sock.makefile('rb')
+
+    def _close(self) -> None:
+        """
+        Drops the connection so the next command reconnects.
+        """
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+        self._sock = None
+        self._reader = None
+
+    def _command(self, *args: str):
+        """
+        Sends one command and returns its decoded reply.
+        """
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = str(arg).encode('utf-8')
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._connect()
+                self._sock.sendall(b"".join(parts))
+                return self._read_reply()
+            except OSError:
+                self._close()
+                raise
+
+    def _read_reply(self):
+        """
+        Parses one RESP reply from the connection.
+        """
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("session store closed the connection")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode('utf-8')
+        if kind == b"-":
+            raise RuntimeError(payload.decode('utf-8'))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)[:-2]
+            return data.decode('utf-8')
+        if kind == b"*":
+            return [self._read_reply() for _ in range(int(payload))]
+        raise RuntimeError("unexpected reply from session store")
+
+    def set(self, session_id: str, user_id: str, ttl: int = 0) -> None:
+        """
+        Stores user_id under session_id.
+        """
+        if ttl > 0:
+            self._command("SET", self.PREFIX + session_id, user_id, "EX", ttl)
+        else:
+            self._command("SET", self.PREFIX + session_id, user_id)
+
+    def get(self, session_id: str) -> Optional[str]:
+        """
+        Returns the user ID for a live session_id, or None.
+        """
+        return self._command("GET", self.PREFIX + session_id)
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Removes session_id, returning whether it existed.
+        """
+        return self._command("DEL", self.PREFIX + session_id) > 0
+
+
+def session_store_from_env() -> SessionStore:
+    """
+    Builds the store named by SESSION_STORE (memory, sqlite or redis).
+    """
+    kind = os.getenv('SESSION_STORE', 'memory')
+    if kind == 'sqlite':
+        return SQLiteSessionStore(
+            os.getenv('SESSION_STORE_PATH', '.db_sessions.sqlite'))
+    if kind == 'redis':
+        return RedisSessionStore(
+            os.getenv('SESSION_STORE_URL', 'redis://localhost:6379'))
+    return MemorySessionStore()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Base module for the in-memory, file-backed model store.
+"""
+
+from datetime import datetime
+from typing import Iterable, List, TypeVar
+from models.log_store import LogStore, Record
+import os
+import uuid
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+COMPACT_MIN_RECORDS = int(os.getenv("MODELS_COMPACT_MIN_RECORDS", 1000))
+DATA = {}
+INDEXES = {}
+STORES = {}
+
+
+class Base():
+    """
+    Base class for stored models.
+
+    Each class persists to an append-only `.db_<Class>.log` (see
+    LogStore). DATA maps class name then id to a Record; objects are only
+    decoded from the log the first time they are accessed. Attributes
+    listed in a subclass's `__indexed__` also get a hash index in
+    INDEXES, mapping each value to the records holding it, which is kept
+    in step on save() and remove().
+    """
+
+    __indexed__ = ()
+
+    def __init__(self, *args: list, **kwargs: dict):
+        """
+        Initializes a Base instance.
+        """
+        self.__class__._records()
+
+        self.id = kwargs.get('id', str(uuid.uuid4()))
+        if kwargs.get('created_at') is not None:
+            self.created_at = datetime.strptime(kwargs.get('created_at'),
+                                                TIMESTAMP_FORMAT)
+        else:
+            self.created_at = datetime.utcnow()
+        if kwargs.get('updated_at') is not None:
+            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
+                                                TIMESTAMP_FORMAT)
+        else:
+            self.updated_at = datetime.utcnow()
+
+    def __eq__(self, other: TypeVar('Base')) -> bool:
+        """
+        Equality by class and id.
+        """
+        if type(self) is not type(other):
+            return False
+        if not isinstance(self, Base):
+            return False
+        return (self.id == other.id)
+
+    def to_json(self, for_serialization: bool = False) -> dict:
+        """
+        Converts the object to a JSON-compatible dictionary.
+        """
+        result = {}
+        for key, value in self.__dict__.items():
+            if not for_serialization and key[0] == '_':
+                continue
+            if type(value) is datetime:
+                result[key] = value.strftime(TIMESTAMP_FORMAT)
+            else:
+                result[key] = value
+        return result
+
+    @classmethod
+    def load_from_file(cls):
+        """
+        Indexes the class's log without decoding the stored objects.
+        """
+        s_class = cls.__name__
+        DATA[s_class] = {}
+        INDEXES[s_class] = {attr: {} for attr in cls.__indexed__}
+        store = STORES.get(s_class)
+        if store is None:
+            store = STORES[s_class] = LogStore(".db_{}.log".format(s_class))
+        for op, obj_id, values, offset in store.scan():
+            cls._drop(obj_id)
+            if op == 'P':
+                cls._add(obj_id, Record(offset, None, values))
+
+    @classmethod
+    def save_to_file(cls):
+        """
+        Compacts the class's log down to one line per live object.
+        """
+        s_class = cls.__name__
+        STORES[s_class].compact(cls._records().values())
+
+    @classmethod
+    def _records(cls) -> dict:
+        """
+        Returns the class's records, loading them on first use.
+        """
+        s_class = cls.__name__
+        if s_class not in DATA:
+            cls.load_from_file()
+        return DATA[s_class]
+
+    @classmethod
+    def _add(cls, obj_id: str, record: Record):
+        """
+        Stores record under obj_id and indexes its values.
+        """
+        s_class = cls.__name__
+        DATA[s_class][obj_id] = record
+        indexes = INDEXES[s_class]
+        for attr, value in zip(cls.__indexed__, record.values):
+            indexes[attr].setdefault(value, {})[obj_id] = record
+
+    @classmethod
+    def _drop(cls, obj_id: str) -> bool:
+        """
+        Removes obj_id and its index entries, returning whether it existed.
+        """
+        s_class = cls.__name__
+        record = DATA[s_class].pop(obj_id, None)
+        if record is None:
+            return False
+        indexes = INDEXES[s_class]
+        for attr, value in zip(cls.__indexed__, record.values):
+            bucket = indexes[attr].get(value)
+            if bucket is not None:
+                bucket.pop(obj_id, None)
+                if not bucket:
+                    del indexes[attr][value]
+        return True
+
+    @classmethod
+    def _load(cls, record: Record) -> TypeVar('Base'):
+        """
+        Returns the record's object, decoding it from the log if needed.
+        """
+        if record.obj is None:
+            obj_json = STORES[cls.__name__].read(record.offset)
+            record.obj = cls(**obj_json)
+        return record.obj
+
+    @classmethod
+    def _maybe_compact(cls):
+        """
+        Compacts once dead lines outnumber live objects.
+        """
+        s_class = cls.__name__
+        live = len(DATA[s_class])
+        if STORES[s_class].records > 2 * live + COMPACT_MIN_RECORDS:
+            cls.save_to_file()
+
+    def save(self):
+        """
+        Saves the current object with a single log append.
+        """
+        cls = self.__class__
+        cls._records()
+        self.updated_at = datetime.utcnow()
+        values = tuple(getattr(self, attr, None) for attr in cls.__indexed__)
+        offset = STORES[cls.__name__].append_put(self.id, values,
+                                                 self.to_json(True))
+        cls._drop(self.id)
+        cls._add(self.id, Record(offset, self, values))
+        cls._maybe_compact()
+
+    def remove(self):
+        """
+        Removes the object.
+        """
+        cls = self.__class__
+        cls._records()
+        if cls._drop(self.id):
+            STORES[cls.__name__].append_delete(self.id)
+            cls._maybe_compact()
+
+    @classmethod
+    def count(cls) -> int:
+        """
+        Counts all objects.
+        """
+        return len(cls._records())
+
+    @classmethod
+    def all(cls) -> Iterable[TypeVar('Base')]:
+        """
+        Returns all objects.
+        """
+        return cls.search()
+
+    @classmethod
+    def get(cls, id: str) -> TypeVar('Base'):
+        """
+        Returns one object by ID.
+        """
+        record = cls._records().get(id)
+        if record is None:
+            return None
+        return cls._load(record)
+
+    @classmethod
+    def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
+        """
+        Searches all objects with matching attributes.
+
+        The candidate set comes from the most selective index among the
+        filtered attributes (`id` always counts as indexed); only those
+        candidates are decoded and compared against the remaining filters.
+        """
+        records = cls._records()
+        indexes = INDEXES[cls.__name__]
+        candidates = None
+        for attr, value in attributes.items():
+            if attr == 'id':
+                record = records.get(value)
+                bucket = {value: record} if record is not None else {}
+            elif attr in indexes:
+                bucket = indexes[attr].get(value, {})
+            else:
+                continue
+            if candidates is None or len(bucket) < len(candidates):
+                candidates = bucket
+            if not candidates:
+                return []
+        if candidates is None:
+            candidates = records
+
+        def _search(obj):
+            if len(attributes) == 0:
+                return True
+            for k, v in attributes.items():
+                if (getattr(obj, k) != v):
+                    return False
+            return True
+
+        return [obj for obj in map(cls._load, list(candidates.values()))
+                if _search(obj)]
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Append-only, log-structured file store for models.
+"""
+
+from os import path
+from typing import Iterable, Iterator, Optional, Tuple
+import json
+import os
+
+
+class Record:
+    """
+    Compact in-memory entry for one stored object.
+
+    `offset` locates the object's latest line in the log, `obj` is the
+    materialized instance (None until first accessed) and `values` holds
+    the indexed attribute values written with that line.
+    """
+
+    __slots__ = ('offset', 'obj', 'values')
+
+    def __init__(self, offset: int, obj=None, values: tuple = ()):
+        """
+        Initializes a Record.
+        """
+        self.offset = offset
+        self.obj = obj
+        self.values = values
+
+
+class LogStore:
+    """
+    JSON-lines log for one model class.
+
+    Each save appends a `P<TAB>id<TAB>[indexed values]<TAB>{object}` line
+    and each removal a `D<TAB>id` line, so a write costs one append
+    whatever the store size. Scanning at startup reads only ids and
+    indexed values; objects are decoded on demand with read(). A torn
+    final line left by a crash is dropped on the next scan. compact()
+    rewrites the live lines to a temporary file and atomically renames it
+    over the log.
+    """
+
+    def __init__(self, file_path: str):
+        """
+        Initializes the store for file_path.
+        """
+        self.file_path = file_path
+        self.records = 0
+        self._file = None
+
+    def scan(self) -> Iterator[Tuple[str, str, tuple, int]]:
+        """
+        Yields (op, id, indexed values, offset) for each complete line.
+        """
+        self.close()
+        self.records = 0
+        if not path.exists(self.file_path):
+            return
+        offset = 0
+        with open(self.file_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                parts = line.rstrip(b'\n').split(b'\t', 3)
+                op, obj_id = parts[0].decode(), parts[1].decode()
+                values = tuple(json.loads(parts[2])) if op == 'P' else ()
+                self.records += 1
+                yield op, obj_id, values, offset
+                offset += len(line)
+        if path.getsize(self.file_path) > offset:
+            with open(self.file_path, 'r+b') as f:
+                f.truncate(offset)
+
+    def read(self, offset: int) -> dict:
+        """
+        Decodes the object stored on the line at offset.
+        """
+        if self._file is not None:
+            self._file.flush()
+        with open(self.file_path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline().split(b'\t', 3)[3])
+
+    def append_put(self, obj_id: str, values: tuple, obj_json: dict) -> int:
+        """
+        Appends an object and returns the offset of its line.
+        """
+        return self._append("P\t{}\t{}\t{}\n".format(
+            obj_id, json.dumps(list(values)), json.dumps(obj_json)))
+
+    def append_delete(self, obj_id: str) -> int:
+        """
+        Appends a removal marker for obj_id.
+        """
+        return self._append("D\t{}\n".format(obj_id))
+
+    def compact(self, records: Iterable[Record]) -> None:
+        """
+        Rewrites the log with only the given records, updating offsets.
+        """
+        self.close()
+        if not path.exists(self.file_path):
+            return
+        tmp_path = self.file_path + ".tmp"
+        records = sorted(records, key=lambda record: record.offset)
+        offset = 0
+        with open(self.file_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            for record in records:
+                src.seek(record.offset)
+                line = src.readline()
+                dst.write(line)
+                record.offset = offset
+                offset += len(line)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, self.file_path)
+        self.records = len(records)
+
+    def close(self) -> None:
+        """
+        Closes the append handle.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _append(self, line: str) -> int:
+        """
+        Writes one line at the end of the log.
+        """
+        if self._file is None:
+            self._file = open(self.file_path, 'ab')
+        offset = self._file.tell()
+        self._file.write(line.encode('utf-8'))
+        self._file.flush()
+        self.records += 1
+        return offset
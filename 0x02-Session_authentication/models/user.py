@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+User model module.
+"""
+
+from models.base import Base
+import hashlib
+import hmac
+
+
+class User(Base):
+    """
+    User class for user-related data.
+    """
+    email: str
+    password: str
+    first_name: str
+    last_name: str
+
+    __indexed__ = ('email',)
+
+    def __init__(self, *args: list, **kwargs: dict):
+        """
+        Initializes a User, restoring stored attributes from kwargs.
+
+        A stored `_password` hash is kept as is; a clear `password` (as
+        written by older versions of the store) is hashed.
+        """
+        super().__init__(*args, **kwargs)
+        self.email = kwargs.get('email')
+        if '_password' in kwargs:
+            self._password = kwargs.get('_password')
+        else:
+            self.password = kwargs.get('password')
+        self.first_name = kwargs.get('first_name')
+        self.last_name = kwargs.get('last_name')
+
+    @property
+    def password(self) -> str:
+        """
+        Returns the SHA256 hex digest of the password.
+        """
+        return self._password
+
+    @password.setter
+    def password(self, pwd: str):
+        """
+        Stores the SHA256 hex digest of pwd, never pwd itself.
+        """
+        if pwd is None or not isinstance(pwd, str):
+            self._password = None
+        else:
+            self._password = hashlib.sha256(pwd.encode()).hexdigest().lower()
+
+    def is_valid_password(self, pwd: str) -> bool:
+        """
+        Checks pwd against the stored password hash.
+        """
+        if pwd is None or not isinstance(pwd, str):
+            return False
+        if self.password is None:
+            return False
+        digest = hashlib.sha256(pwd.encode()).hexdigest().lower()
+        return hmac.compare_digest(digest, self.password)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Tests for SessionAuth on top of a session store.
+"""
+from api.v1.auth.session_auth import SessionAuth
+from api.v1.auth.session_store import MemorySessionStore
+from models.user import User
+
+
+class Request:
+    """
+    Minimal request carrying a session cookie.
+    """
+
+    def __init__(self, session_id: str = None):
+        self.cookies = {"_my_session_id": session_id} if session_id else {}
+
+
+def test_session_login_and_logout(store, monkeypatch):
+    """
+    A created session resolves to its user until it is destroyed.
+    """
+    monkeypatch.setenv("SESSION_NAME", "_my_session_id")
+    user = User(email="a@x.com")
+    user.password = "pwd"
+    user.save()
+    auth = SessionAuth(MemorySessionStore())
+    session_id = auth.create_session(user.id)
+    assert auth.current_user(Request(session_id)) == user
+    assert auth.current_user(Request("other")) is None
+    assert auth.destroy_session(Request(session_id)) is True
+    assert auth.current_user(Request(session_id)) is None
+    assert auth.destroy_session(Request()) is False
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Tests for the session store backends.
+"""
+import socketserver
+import threading
+
+import pytest
+
+from api.v1.auth import session_store
+from api.v1.auth.session_store import (MemorySessionStore,
+                                       RedisSessionStore, SessionStore,
+                                       SQLiteSessionStore)
+
+
+class Clock:
+    """
+    Stand-in for the time module that only moves when told to.
+    """
+
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    """
+    Answers GET, SET [EX seconds] and DEL like a Redis server would.
+    """
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2].decode())
+        return args
+
+    def handle(self):
+        server = self.server
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            command, key = args[0].upper(), args[1]
+            with server.lock:
+                value, expires_at = server.data.get(key, (None, None))
+                if expires_at is not None and \
+                        expires_at <= server.clock.now:
+                    server.data.pop(key, None)
+                    value = None
+                if command == "SET":
+                    ttl = int(args[4]) if len(args) > 4 else None
+                    server.data[key] = (args[2], None if ttl is None
+                                        else server.clock.now + ttl)
+                    reply = b"+OK\r\n"
+                elif command == "GET" and value is None:
+                    reply = b"$-1\r\n"
+                elif command == "GET":
+                    data = value.encode()
+                    reply = b"$%d\r\n%s\r\n" % (len(data), data)
+                elif command == "DEL":
+                    existed = server.data.pop(key, None) is not None
+                    reply = b":%d\r\n" % (1 if existed else 0)
+                else:
+                    reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Freezes the time seen by the stores.
+    """
+    fake = Clock()
+    monkeypatch.setattr(session_store, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def redis_server(clock):
+    """
+    A tiny RESP server on localhost sharing the fake clock.
+    """
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), RESPHandler)
+    server.daemon_threads = True
+    server.data = {}
+    server.lock = threading.Lock()
+    server.clock = clock
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path, clock):
+    """
+    Each store, all driven by the same fake clock.
+    """
+    if request.param == "memory":
+        return MemorySessionStore()
+    if request.param == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.sqlite"))
+    server = request.getfixturevalue("redis_server")
+    host, port = server.server_address
+    return RedisSessionStore(f"redis://{host}:{port}")
+
+
+def test_interface_is_abstract():
+    """
+    The base class cannot be used on its own.
+    """
+    with pytest.raises(TypeError):
+        SessionStore()
+
+
+def test_set_get_delete(backend):
+    """
+    A session maps to its user until deleted, and deleting twice fails.
+    """
+    backend.set("s1", "u1")
+    backend.set("s2", "u2")
+    assert backend.get("s1") == "u1"
+    assert backend.get("missing") is None
+    assert backend.delete("s1") is True
+    assert backend.get("s1") is None
+    assert backend.delete("s1") is False
+    assert backend.get("s2") == "u2"
+
+
+def test_expiry(backend, clock):
+    """
+    A session with a ttl stops resolving once it has passed; a ttl of 0
+    never expires.
+    """
+    backend.set("short", "u1", 10)
+    backend.set("forever", "u2", 0)
+    clock.now += 9
+    assert backend.get("short") == "u1"
+    clock.now += 1
+    assert backend.get("short") is None
+    clock.now += 10 ** 6
+    assert backend.get("forever") == "u2"
+
+
+def test_reset_ttl_outlives_old_expiry(backend, clock):
+    """
+    Setting a session again replaces its expiry.
+    """
+    backend.set("s", "u1", 10)
+    clock.now += 5
+    backend.set("s", "u1", 100)
+    clock.now += 10
+    assert backend.get("s") == "u1"
+
+
+def test_memory_sweep(clock):
+    """
+    sweep() drops expired sessions and keeps live ones; writes reclaim
+    expired sessions a batch at a time.
+    """
+    store = MemorySessionStore()
+    for i in range(200):
+        store.set(f"old{i}", "u", 10)
+    store.set("live", "u", 1000)
+    store.set("forever", "u")
+    clock.now += 20
+    store.set("new", "u", 10)
+    assert len(store._sessions) == 203 - MemorySessionStore.SWEEP_BATCH
+    store.sweep()
+    assert set(store._sessions) == {"live", "forever", "new"}
+    assert store.get("live") == "u"
+
+
+def test_memory_sweeps_without_writes(clock):
+    """
+    Reads and deletes alone reclaim expired sessions once SWEEP_INTERVAL
+    has passed.
+    """
+    store = MemorySessionStore()
+    for i in range(200):
+        store.set(f"old{i}", "u", 10)
+    store.set("live", "u", 1000)
+    clock.now += MemorySessionStore.SWEEP_INTERVAL
+    assert store.get("live") == "u"
+    assert set(store._sessions) == {"live"}
+    assert store._expiries == [(store._sessions["live"][1], "live")]
+    store.set("old", "u", 10)
+    clock.now += MemorySessionStore.SWEEP_INTERVAL
+    assert store.delete("missing") is False
+    assert set(store._sessions) == {"live"}
+
+
+def test_sqlite_sweep(tmp_path, clock, monkeypatch):
+    """
+    sweep() deletes expired rows in batches and keeps live ones.
+    """
+    monkeypatch.setattr(SQLiteSessionStore, "SWEEP_BATCH", 7)
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite"))
+    for i in range(50):
+        store.set(f"old{i}", "u", 10)
+    store.set("live", "u", 1000)
+    store.set("forever", "u")
+    clock.now += 20
+    store.sweep()
+    rows = store._db().execute("SELECT session_id FROM sessions").fetchall()
+    assert {row[0] for row in rows} == {"live", "forever"}
+
+
+def test_sqlite_sessions_are_shared(tmp_path, clock):
+    """
+    Two stores on the same file, as in two workers, see each other's
+    sessions and deletions.
+    """
+    path = str(tmp_path / "sessions.sqlite")
+    first, second = SQLiteSessionStore(path), SQLiteSessionStore(path)
+    first.set("s", "u1", 10)
+    assert second.get("s") == "u1"
+    assert second.delete("s") is True
+    assert first.get("s") is None
+
+
+def test_redis_reconnects(redis_server, clock):
+    """
+    A dropped connection is reopened on the next command.
+    """
+    host, port = redis_server.server_address
+    store = RedisSessionStore(f"redis://{host}:{port}")
+    store.set("s", "u1")
+    store._close()
+    assert store.get("s") == "u1"
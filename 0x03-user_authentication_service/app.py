@@ -1,10 +1,61 @@
 #!/usr/bin/env python3
 """Flask app for user authentication service"""
+import math
 from flask import Flask, jsonify, request
-from auth import Auth
+from auth import Auth, HashPoolFull
+from rate_limit import (RATE_LIMIT_EMAIL_BURST, RATE_LIMIT_EMAIL_RATE,
+                        RATE_LIMIT_IP_BURST, RATE_LIMIT_IP_RATE,
+                        RateLimited, RateLimiter)
+import metrics
+import profiling
 
 app = Flask(__name__)
 AUTH = Auth()
+IP_LIMITER = RateLimiter(RATE_LIMIT_IP_RATE, RATE_LIMIT_IP_BURST)
+EMAIL_LIMITER = RateLimiter(RATE_LIMIT_EMAIL_RATE, RATE_LIMIT_EMAIL_BURST)
+metrics.init_app(app)
+profiling.init_app(app)
+
+
+def email_key(email):
+    """Bucket key for an email address"""
+    return email.strip().lower() if email else None
+
+
+def admit(email, charge_email=True):
+    """Check the client's IP and email buckets before any credential work
+
+    The IP bucket is always charged; the email bucket only when
+    charge_email is set, otherwise it must merely be non-empty.
+    """
+    IP_LIMITER.hit(request.remote_addr)
+    if email:
+        if charge_email:
+            EMAIL_LIMITER.hit(email_key(email))
+        else:
+            EMAIL_LIMITER.check(email_key(email))
+
+
+@app.teardown_appcontext
+def remove_session(exception=None):
+    """Release the request thread's DB session"""
+    AUTH._db.remove_session()
+
+
+@app.errorhandler(HashPoolFull)
+def hash_pool_full(error):
+    """Shed credential work while the hashing queue is full"""
+    response = jsonify({"message": "server busy"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+@app.errorhandler(RateLimited)
+def rate_limited(error):
+    """Refuse a client or email that ran out of tokens"""
+    response = jsonify({"message": "too many requests"})
+    response.headers["Retry-After"] = str(math.ceil(error.retry_after))
+    return response, 429
 
 
 @app.route("/", methods=["GET"])
@@ -18,6 +69,7 @@ def users():
     """Endpoint for user registration"""
     email = request.form.get("email")
     password = request.form.get("password")
+    admit(email)
     try:
         user = AUTH.register_user(email, password)
         return jsonify({"email": user.email, "message": "user created"})
@@ -30,11 +82,14 @@ def login():
     """Endpoint for user login"""
     email = request.form.get("email")
     password = request.form.get("password")
+    admit(email, charge_email=False)
     if AUTH.valid_login(email, password):
         session_id = AUTH.create_session(email)
         response = jsonify({"email": email, "message": "logged in"})
         response.set_cookie("session_id", session_id)
         return response
+    if email:
+        EMAIL_LIMITER.penalize(email_key(email))
     return jsonify({"message": "invalid credentials"}), 401
 
 
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""ASGI app for the user authentication service
+
+Same endpoints and responses as app.py, served by any ASGI server:
+
+    uvicorn async_app:app --port 5000
+"""
+import asyncio
+import json
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qsl
+
+from async_auth import AsyncAuth
+from auth import HashPoolFull
+
+AUTH = AsyncAuth()
+_ready = None
+
+
+async def home(form, cookies):
+    """Base endpoint"""
+    return 200, {"message": "Bienvenue"}, []
+
+
+async def users(form, cookies):
+    """Endpoint for user registration"""
+    email = form.get("email")
+    password = form.get("password")
+    try:
+        user = await AUTH.register_user(email, password)
+        return 200, {"email": user.email, "message": "user created"}, []
+    except ValueError:
+        return 400, {"message": "email already registered"}, []
+
+
+async def login(form, cookies):
+    """Endpoint for user login"""
+    email = form.get("email")
+    password = form.get("password")
+    if await AUTH.valid_login(email, password):
+        session_id = await AUTH.create_session(email)
+        cookie = f"session_id={session_id}; Path=/"
+        return 200, {"email": email, "message": "logged in"}, [
+            (b"set-cookie", cookie.encode())]
+    return 401, {"message": "invalid credentials"}, []
+
+
+async def logout(form, cookies):
+    """Endpoint for user logout"""
+    user = await AUTH.get_user_from_session_id(cookies.get("session_id"))
+    if not user:
+        return 404, {"message": "not found"}, []
+    await AUTH.destroy_session(user.id)
+    return 200, {"message": "logout successful"}, []
+
+
+async def profile(form, cookies):
+    """Endpoint for getting user profile"""
+    user = await AUTH.get_user_from_session_id(cookies.get("session_id"))
+    if not user:
+        return 404, {"message": "not found"}, []
+    return 200, {"email": user.email}, []
+
+
+async def get_reset_password_token(form, cookies):
+    """Endpoint for generating reset password token"""
+    email = form.get("email")
+    try:
+        reset_token = await AUTH.get_reset_password_token(email)
+        return 200, {"email": email, "reset_token": reset_token}, []
+    except ValueError:
+        return 404, {"message": "email not found"}, []
+
+
+async def update_password(form, cookies):
+    """Endpoint for updating password"""
+    email = form.get("email")
+    try:
+        await AUTH.update_password(form.get("reset_token"),
+                                   form.get("new_password"))
+        return 200, {"email": email, "message": "Password updated"}, []
+    except ValueError:
+        return 403, {"message": "invalid reset token"}, []
+
+
+ROUTES = {
+    ("GET", "/"): home,
+    ("POST", "/users"): users,
+    ("POST", "/sessions"): login,
+    ("DELETE", "/sessions"): logout,
+    ("GET", "/profile"): profile,
+    ("POST", "/reset_password"): get_reset_password_token,
+    ("PUT", "/reset_password"): update_password,
+}
+
+
+async def _startup() -> None:
+    """Initialise the database once, on first use"""
+    global _ready
+    if _ready is None:
+        _ready = asyncio.ensure_future(AUTH.init())
+    await _ready
+
+
+async def _read_body(receive) -> bytes:
+    """Collect the whole request body"""
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await _startup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+    await _startup()
+    headers = dict(scope["headers"])
+    body = await _read_body(receive)
+    try:
+        form = dict(parse_qsl(body.decode("utf-8")))
+        cookies = {key: morsel.value for key, morsel in SimpleCookie(
+            headers.get(b"cookie", b"").decode("utf-8")).items()}
+    except UnicodeDecodeError:
+        form = cookies = None
+    handler = ROUTES.get((scope["method"], scope["path"]))
+    extra_headers = []
+    if form is None:
+        status, payload = 400, {"message": "request is not valid UTF-8"}
+    elif handler is None:
+        status, payload = 404, {"message": "Not found"}
+    else:
+        try:
+            status, payload, extra_headers = await handler(form, cookies)
+        except HashPoolFull:
+            status, payload = 503, {"message": "server busy"}
+            extra_headers = [(b"retry-after", b"1")]
+    data = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(data)).encode())]
+        + extra_headers,
+    })
+    await send({"type": "http.response.body", "body": data})
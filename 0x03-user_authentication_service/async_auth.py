@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Async Auth, the asyncio counterpart of auth.Auth
+"""
+import asyncio
+
+import bcrypt
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm.exc import NoResultFound
+
+from async_db import AsyncDB
+from auth import (BCRYPT_ROUNDS, HASH_POOL, _expired, _generate_uuid,
+                  _needs_rehash)
+from db import RESET_TOKEN_TTL, SESSION_TTL, expires_in
+from session_cache import SessionCache
+from user import User
+
+
+async def _run_in_hash_pool(fn, *args):
+    """Await fn(*args) on the shared bcrypt pool (HashPoolFull if full)"""
+    return await asyncio.wrap_future(HASH_POOL.submit(fn, *args))
+
+
+async def _hash_password(password: str) -> bytes:
+    """A function that hashes password"""
+    return await _run_in_hash_pool(
+        bcrypt.hashpw, password.encode('utf-8'),
+        bcrypt.gensalt(BCRYPT_ROUNDS))
+
+
+class AsyncAuth:
+    """AsyncAuth class to interact with the authentication database."""
+
+    def __init__(self):
+        self._db = AsyncDB()
+        self._session_cache = SessionCache()
+
+    async def init(self) -> None:
+        """Prepare the database"""
+        await self._db.init()
+
+    async def register_user(self, email: str, password: str) -> User:
+        """A function that registers users"""
+        try:
+            await self._db.find_user_by(email=email)
+            raise ValueError(f'User {email} already exists')
+        except NoResultFound:
+            hashed_password = await _hash_password(password)
+            return await self._db.add_user(email, hashed_password)
+
+    async def valid_login(self, email: str, password: str) -> bool:
+        """Credentials validation, rehashing a stale-cost hash on success"""
+        try:
+            user = await self._db.find_user_by(email=email)
+        except (NoResultFound, InvalidRequestError):
+            return False
+        valid = await _run_in_hash_pool(
+            bcrypt.checkpw, password.encode('utf-8'), user.hashed_password)
+        if valid and _needs_rehash(user.hashed_password):
+            await self._db.update_user(
+                user.id, hashed_password=await _hash_password(password))
+        return valid
+
+    async def create_session(self, email: str) -> str:
+        """Create a session ID for a user"""
+        try:
+            user = await self._db.find_user_by(email=email)
+        except NoResultFound:
+            return None
+        session_id = _generate_uuid()
+        await self._db.update_user(
+            user.id, session_id=session_id,
+            session_expires_at=expires_in(SESSION_TTL))
+        self._session_cache.invalidate_user(user.id)
+        return session_id
+
+    async def get_user_from_session_id(self, session_id: str) -> User:
+        """Get a user by session ID"""
+        if session_id is None:
+            return None
+        user = self._session_cache.get(session_id)
+        if user is None:
+            version = self._session_cache.version
+            try:
+                user = await self._db.find_user_by(session_id=session_id)
+            except NoResultFound:
+                return None
+            self._session_cache.put(session_id, user, version)
+        if _expired(user.session_expires_at):
+            return None
+        return user
+
+    async def destroy_session(self, user_id: int) -> None:
+        """Destroy a user's session"""
+        await self._db.update_user(user_id, session_id=None,
+                                   session_expires_at=None)
+        self._session_cache.invalidate_user(user_id)
+
+    async def get_reset_password_token(self, email: str) -> str:
+        """Generate a password reset token"""
+        try:
+            user = await self._db.find_user_by(email=email)
+        except NoResultFound:
+            raise ValueError("User not found")
+        reset_token = _generate_uuid()
+        await self._db.update_user(
+            user.id, reset_token=reset_token,
+            reset_expires_at=expires_in(RESET_TOKEN_TTL))
+        return reset_token
+
+    async def update_password(self, reset_token: str, password: str) -> None:
+        """Update the user's password"""
+        if reset_token is None:
+            raise ValueError("Invalid reset token")
+        try:
+            user = await self._db.find_user_by(reset_token=reset_token)
+        except NoResultFound:
+            raise ValueError("Invalid reset token")
+        if _expired(user.reset_expires_at):
+            raise ValueError("Invalid reset token")
+        hashed_password = await _hash_password(password)
+        await self._db.update_user(
+            user.id, hashed_password=hashed_password, reset_token=None,
+            reset_expires_at=None)
+        self._session_cache.invalidate_user(user.id)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Async DB module, the asyncio counterpart of db.DB
+"""
+import os
+
+from sqlalchemy import event, select
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm.exc import NoResultFound
+
+from db import (DB_RESET, DB_URL, EXPIRING_COLUMNS, _migrate,
+                _set_sqlite_pragmas)
+from user import User
+
+ASYNC_DB_URL = os.getenv(
+    "AUTH_ASYNC_DB_URL",
+    DB_URL.replace("sqlite://", "sqlite+aiosqlite://", 1))
+
+
+class AsyncDB:
+    """AsyncDB class
+
+    Same operations as DB on an async engine (aiosqlite for SQLite).
+    Each call uses its own short-lived session, and returned users stay
+    readable after it closes.
+    """
+
+    def __init__(self, url: str = ASYNC_DB_URL,
+                 reset: bool = DB_RESET) -> None:
+        """Create the engine, the schema is checked by init()
+        """
+        self._engine = create_async_engine(url, echo=False)
+        if self._engine.dialect.name == "sqlite":
+            event.listen(self._engine.sync_engine, "connect",
+                         _set_sqlite_pragmas)
+        self._sessions = async_sessionmaker(self._engine,
+                                            expire_on_commit=False)
+        self._reset = reset
+
+    async def init(self) -> None:
+        """Create or migrate the schema if needed
+        """
+        async with self._engine.begin() as connection:
+            await connection.run_sync(_migrate, self._reset)
+
+    async def add_user(self, email: str, hashed_password: bytes) -> User:
+        """ adds user to database
+        """
+        user = User(email=email, hashed_password=hashed_password)
+        async with self._sessions() as session:
+            session.add(user)
+            await session.commit()
+        return user
+
+    async def find_user_by(self, **kwargs) -> User:
+        """ find user function, a token column never matches None """
+        for key, value in kwargs.items():
+            if key not in User.__dict__:
+                raise InvalidRequestError
+            if value is None and key in EXPIRING_COLUMNS:
+                raise NoResultFound
+        async with self._sessions() as session:
+            result = await session.execute(
+                select(User).filter_by(**kwargs).limit(1))
+            user = result.scalars().first()
+        if user is None:
+            raise NoResultFound
+        return user
+
+    async def update_user(self, user_id: int, **kwargs) -> None:
+        ''' update user '''
+        async with self._sessions() as session:
+            user = await session.get(User, user_id)
+            if user is None:
+                raise ValueError
+            for key, value in kwargs.items():
+                if not hasattr(user, key):
+                    raise ValueError
+                setattr(user, key, value)
+            await session.commit()
@@ -1,30 +1,151 @@
 #!/usr/bin/env python3
 """ Hash password """
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Tuple
 import bcrypt
-from db import DB
+from db import DB, RESET_TOKEN_TTL, SESSION_TTL, expires_in, utcnow
+from metrics import timed
+from session_cache import (SESSION_CACHE_TTL, SIGNED_USER_CACHE_TTL,
+                           SessionCache)
+from signed_session import SESSION_MODE, SessionSigner
 from user import User
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.exc import InvalidRequestError
 from uuid import uuid4
 
 
+HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", os.cpu_count() or 1))
+HASH_QUEUE_SIZE = int(os.getenv("AUTH_HASH_QUEUE_SIZE", HASH_WORKERS * 4))
+
+
+def hash_timings(max_cost: int = 16, min_cost: int = 4,
+                 budget_ms: float = None) -> Dict[int, float]:
+    """Milliseconds for one bcrypt hash at each cost, stopping after the
+    first cost slower than budget_ms"""
+    timings = {}
+    for cost in range(min_cost, max_cost + 1):
+        salt = bcrypt.gensalt(cost)
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration", salt)
+        timings[cost] = (time.perf_counter() - start) * 1000
+        if budget_ms is not None and timings[cost] > budget_ms:
+            break
+    return timings
+
+
+def calibrate_cost(budget_ms: float, max_cost: int = 16,
+                   min_cost: int = 4) -> Tuple[int, Dict[int, float]]:
+    """Highest bcrypt cost whose hash fits budget_ms, with the timings"""
+    timings = hash_timings(max_cost, min_cost, budget_ms)
+    fitting = [cost for cost, ms in timings.items() if ms <= budget_ms]
+    return max(fitting, default=min_cost), timings
+
+
+BCRYPT_BUDGET_MS = os.getenv("AUTH_BCRYPT_BUDGET_MS")
+BCRYPT_MIN_COST = int(os.getenv("AUTH_BCRYPT_MIN_COST", 10))
+if BCRYPT_BUDGET_MS:
+    BCRYPT_ROUNDS = calibrate_cost(float(BCRYPT_BUDGET_MS),
+                                   min_cost=BCRYPT_MIN_COST)[0]
+else:
+    BCRYPT_ROUNDS = int(os.getenv("AUTH_BCRYPT_COST", 12))
+
+
+def _needs_rehash(hashed_password) -> bool:
+    """Whether a stored hash was made with a cost below BCRYPT_ROUNDS
+
+    Stronger hashes are kept, so a process that calibrated lower never
+    downgrades them and hashes do not flip between processes' costs.
+    """
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode('utf-8')
+    return int(hashed_password[4:6]) < BCRYPT_ROUNDS
+
+
+class HashPoolFull(Exception):
+    """Raised when the password hashing queue is at capacity"""
+
+
+class HashPool:
+    """Bounded worker pool for bcrypt operations.
+
+    bcrypt releases the GIL, so a thread pool keeps hashing off the
+    request threads while capping how many cores it can occupy. At most
+    `workers + queue_size` operations are admitted at once; anything
+    beyond that is rejected with HashPoolFull instead of queueing.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS,
+                 queue_size: int = HASH_QUEUE_SIZE) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def submit(self, fn, *args) -> Future:
+        """Admit fn(*args) to the pool and return its future"""
+        if not self._slots.acquire(blocking=False):
+            raise HashPoolFull
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool and wait for its result"""
+        return self.submit(fn, *args).result()
+
+
+HASH_POOL = HashPool()
+_checkpw = timed("checkpw")(bcrypt.checkpw)
+
+
+@timed("hash_password")
 def _hash_password(password: str) -> bytes:
     """A function that hashes password"""
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
+    salt = bcrypt.gensalt(BCRYPT_ROUNDS)
+    hashed_password = HASH_POOL.run(
+        bcrypt.hashpw, password.encode('utf-8'), salt)
     return hashed_password
 
 
+def _expired(expires_at) -> bool:
+    """Whether a token expiry time has passed; None never expires"""
+    return expires_at is not None and expires_at <= utcnow()
+
+
 def _generate_uuid() -> str:
     """Generates uuid and returns a string representation"""
     return str(uuid4())
 
 
 class Auth:
-    """Auth class to interact with the authentication database."""
+    """Auth class to interact with the authentication database.
 
-    def __init__(self):
-        self._db = DB()
+    In "db" session mode a session is a random ID stored on the user row,
+    and lookups are cached for AUTH_SESSION_CACHE_TTL seconds. In
+    "signed" mode it is a token from SessionSigner that carries the
+    user's session generation; bumping the generation revokes it, and
+    users are cached for AUTH_SIGNED_USER_CACHE_TTL seconds. Invalidation
+    only reaches this process's cache, so those TTLs bound how long a
+    logout or password reset made by another worker goes unseen.
+    """
+
+    def __init__(self, session_mode: str = SESSION_MODE,
+                 signer: SessionSigner = None, db: DB = None):
+        if session_mode not in ("db", "signed"):
+            raise ValueError(f"unknown session mode {session_mode!r}")
+        self._db = db or DB()
+        self._session_cache = SessionCache(
+            ttl=SIGNED_USER_CACHE_TTL if session_mode == "signed"
+            else SESSION_CACHE_TTL)
+        self._session_mode = session_mode
+        self._signer = signer or SessionSigner()
 
     def register_user(self, email: str, password: str) -> User:
         """A function that registers users"""
@@ -36,14 +157,23 @@ class Auth:
             return self._db.add_user(email, hashed_password)
 
     def valid_login(self, email: str, password: str) -> bool:
-        """Credentials validation"""
+        """Credentials validation
+
+        A hash weaker than BCRYPT_ROUNDS is replaced after a successful
+        check.
+        """
         try:
             user = self._db.find_user_by(email=email)
             if user:
-                return bcrypt.checkpw(
+                valid = HASH_POOL.run(
+                    _checkpw,
                     password.encode('utf-8'),
                     user.hashed_password
                 )
+                if valid and _needs_rehash(user.hashed_password):
+                    self._db.update_user(
+                        user.id, hashed_password=_hash_password(password))
+                return valid
         except (NoResultFound, InvalidRequestError):
             return False
         return False
@@ -52,8 +182,12 @@ class Auth:
         """Create a session ID for a user"""
         try:
             user = self._db.find_user_by(email=email)
+            if self._session_mode == "signed":
+                return self._signer.sign(user.id, user.session_generation)
             session_id = _generate_uuid()
-            self._db.update_user(user.id, session_id=session_id)
+            self._db.update_user(user.id, session_id=session_id,
+                                 session_expires_at=expires_in(SESSION_TTL))
+            self._session_cache.invalidate_user(user.id)
             return session_id
         except NoResultFound:
             return None
@@ -62,32 +196,91 @@ class Auth:
         """Get a user by session ID"""
         if session_id is None:
             return None
-        try:
-            user = self._db.find_user_by(session_id=session_id)
-            return user
-        except NoResultFound:
+        if self._session_mode == "signed":
+            return self._user_from_token(session_id)
+        user = self._session_cache.get(session_id)
+        if user is None:
+            version = self._session_cache.version
+            try:
+                user = self._db.find_user_by(session_id=session_id)
+            except NoResultFound:
+                return None
+            self._db.detach(user)
+            self._session_cache.put(session_id, user, version)
+        if _expired(user.session_expires_at):
             return None
+        return user
+
+    def _user_from_token(self, token: str) -> User:
+        """Get the user a signed token belongs to
+
+        Verifying the token costs one HMAC. The user row is then served
+        from the session cache under its ID, so only a cache miss reads
+        the database, and the token must carry the row's generation.
+        """
+        claims = self._signer.verify(token)
+        if claims is None:
+            return None
+        key = f"user:{claims.user_id}"
+        user = self._session_cache.get(key)
+        if user is None:
+            version = self._session_cache.version
+            try:
+                user = self._db.find_user_by(id=claims.user_id)
+            except NoResultFound:
+                return None
+            self._db.detach(user)
+            self._session_cache.put(key, user, version)
+        if user.session_generation != claims.generation:
+            return None
+        return user
 
     def destroy_session(self, user_id: int) -> None:
         """Destroy a user's session"""
-        self._db.update_user(user_id, session_id=None)
+        if self._session_mode == "signed":
+            self._db.update_user(
+                user_id, session_generation=User.session_generation + 1)
+        else:
+            self._db.update_user(user_id, session_id=None,
+                                 session_expires_at=None)
+        self._session_cache.invalidate_user(user_id)
 
     def get_reset_password_token(self, email: str) -> str:
         """Generate a password reset token"""
         try:
             user = self._db.find_user_by(email=email)
             reset_token = _generate_uuid()
-            self._db.update_user(user.id, reset_token=reset_token)
+            self._db.update_user(
+                user.id, reset_token=reset_token,
+                reset_expires_at=expires_in(RESET_TOKEN_TTL))
             return reset_token
         except NoResultFound:
             raise ValueError("User not found")
 
     def update_password(self, reset_token: str, password: str) -> None:
         """Update the user's password"""
+        if reset_token is None:
+            raise ValueError("Invalid reset token")
         try:
             user = self._db.find_user_by(reset_token=reset_token)
+            if _expired(user.reset_expires_at):
+                raise NoResultFound
             hashed_password = _hash_password(password)
             self._db.update_user(
-                user.id, hashed_password=hashed_password, reset_token=None)
+                user.id, hashed_password=hashed_password, reset_token=None,
+                reset_expires_at=None,
+                session_generation=User.session_generation + 1)
+            self._session_cache.invalidate_user(user.id)
         except NoResultFound:
             raise ValueError("Invalid reset token")
+
+
+if __name__ == "__main__":
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 250
+    cost, timings = calibrate_cost(budget)
+    for level, ms in timings.items():
+        print(f"cost {level:2d}: {ms:9.1f} ms")
+    print(f"AUTH_BCRYPT_COST={cost} fits a {budget:.0f} ms budget")
+    if cost < BCRYPT_MIN_COST:
+        print(f"startup calibration would use the floor, "
+              f"AUTH_BCRYPT_MIN_COST={BCRYPT_MIN_COST}")
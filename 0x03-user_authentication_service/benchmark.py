@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+"""
+Load test for the user authentication service.
+
+Runs the register / login / profile / logout / reset-password flow for
+many users at a given concurrency, either in-process through Flask's test
+client or against a live server, and reports per-step p50/p95/p99 latency
+and throughput. Results can be saved as a JSON baseline and later runs
+compared against it.
+
+With --attackers, extra threads send registrations and failing logins
+from a single address while the flow runs, each at --attack-rate requests
+per second, to show that admission control keeps serving other clients.
+
+With --sweep-backlog, it instead fills a database with that many expired
+sessions and reset tokens and times each batch of DB.sweep_expired.
+
+With --scaling, the flow is repeated at each of the given concurrency
+levels and throughput is printed per level.
+
+With --lookup-scaling, it grows a users table through the given sizes and
+times DB.find_user_by on email, session_id and reset_token at each size.
+
+With --group-commit MS, it instead times the session write of a login
+(Auth.create_session) from --concurrency threads, once committing each
+write and once batching them over an MS millisecond group-commit window.
+
+With --cold-start N, it starts app.py N times as a fresh server process
+and times each start until the first request is answered, against a new
+database and against one that already exists.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+
+class InProcessClient:
+    """
+    Drives app.py through Flask's test client, keeping cookies.
+    """
+
+    def __init__(self, app, remote_addr: str = "127.0.0.1") -> None:
+        self.client = app.test_client()
+        self.environ = {"REMOTE_ADDR": remote_addr}
+
+    def request(self, method: str, path: str,
+                data: Optional[Dict] = None) -> Tuple[int, Dict]:
+        """
+        Send one request and return its status and JSON body.
+        """
+        response = self.client.open(path, method=method, data=data,
+                                    environ_base=self.environ)
+        return response.status_code, response.get_json(silent=True) or {}
+
+
+class HTTPClient:
+    """
+    Drives a live server over HTTP with requests, keeping cookies.
+    """
+
+    def __init__(self, base_url: str) -> None:
+        import requests
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+    def request(self, method: str, path: str,
+                data: Optional[Dict] = None) -> Tuple[int, Dict]:
+        """
+        Send one request and return its status and JSON body.
+        """
+        response = self.session.request(method, self.base_url + path,
+                                        data=data)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, {}
+
+
+def run_flow(client, email: str, profile_reads: int,
+             record) -> None:
+    """
+    Run one user's full flow, recording (step, seconds, ok) per request.
+    """
+    password, new_password = "b4l0u", "t4rt1fl3tt3"
+
+    def step(name, expected, method, path, data=None):
+        start = time.perf_counter()
+        status, body = client.request(method, path, data)
+        record(name, time.perf_counter() - start, status == expected)
+        return body
+
+    step("register", 200, "POST", "/users",
+         {"email": email, "password": password})
+    step("login", 200, "POST", "/sessions",
+         {"email": email, "password": password})
+    for _ in range(profile_reads):
+        step("profile", 200, "GET", "/profile")
+    step("logout", 200, "DELETE", "/sessions")
+    token = step("reset_token", 200, "POST", "/reset_password",
+                 {"email": email}).get("reset_token")
+    step("update_password", 200, "PUT", "/reset_password",
+         {"email": email, "reset_token": token,
+          "new_password": new_password})
+
+
+def run_attack(client, rate: float, stop: threading.Event,
+               record) -> None:
+    """
+    Alternate registering a fresh email and failing to log in with it at
+    `rate` requests per second until stop is set, recording
+    (seconds, rejected) per request.
+    """
+    interval = 1 / rate
+    next_at = time.perf_counter()
+    while not stop.is_set():
+        email = f"attack-{uuid.uuid4().hex}@example.com"
+        for method, path, password in (("POST", "/users", "x"),
+                                       ("POST", "/sessions", "wrong")):
+            start = time.perf_counter()
+            status, _ = client.request(method, path, {
+                "email": email, "password": password})
+            record(time.perf_counter() - start, status == 429)
+            next_at += interval
+            stop.wait(max(0.0, next_at - time.perf_counter()))
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1,
+                       int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples: Dict[str, List[Tuple[float, bool]]],
+              elapsed: float, config: Dict,
+              attack: Optional[List[Tuple[float, bool]]] = None) -> Dict:
+    """
+    Build the JSON-serialisable report for one run.
+    """
+    steps = {}
+    total = 0
+    for name, values in samples.items():
+        latencies = sorted(seconds for seconds, _ in values)
+        total += len(values)
+        steps[name] = {
+            "count": len(values),
+            "errors": sum(1 for _, ok in values if not ok),
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "requests_per_second": len(values) / elapsed,
+        }
+    report = {
+        "config": config,
+        "elapsed_seconds": elapsed,
+        "requests": total,
+        "requests_per_second": total / elapsed,
+        "steps": steps,
+    }
+    if attack:
+        latencies = sorted(seconds for seconds, _ in attack)
+        report["attack"] = {
+            "count": len(attack),
+            "rejected": sum(1 for _, rejected in attack if rejected),
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "requests_per_second": len(attack) / elapsed,
+        }
+    return report
+
+
+def run(users: int, concurrency: int, profile_reads: int,
+        base_url: Optional[str] = None, attackers: int = 0,
+        attack_rate: float = 50) -> Dict:
+    """
+    Run the flow for `users` users over `concurrency` threads, alongside
+    `attackers` threads sending `attack_rate` credential requests a second.
+    """
+    if base_url is None:
+        os.environ.setdefault("AUTH_DB_URL", "sqlite:///" + os.path.join(
+            tempfile.mkdtemp(), "benchmark.db"))
+        os.environ.setdefault("AUTH_DB_RESET", "1")
+        from app import app
+
+        # One address per simulated client, so per-IP buckets are not
+        # shared the way they would be by everyone behind 127.0.0.1.
+        def make_client(index=0):
+            return InProcessClient(
+                app, f"10.{index >> 16 & 255}.{index >> 8 & 255}."
+                f"{index & 255}")
+    else:
+        def make_client(index=0):
+            return HTTPClient(base_url)
+
+    samples: Dict[str, List[Tuple[float, bool]]] = {}
+    lock = threading.Lock()
+
+    def record(name, seconds, ok):
+        with lock:
+            samples.setdefault(name, []).append((seconds, ok))
+
+    attack: List[Tuple[float, bool]] = []
+
+    def record_attack(seconds, rejected):
+        with lock:
+            attack.append((seconds, rejected))
+
+    run_id = uuid.uuid4().hex[:8]
+
+    def worker(index):
+        run_flow(make_client(index + 1),
+                 f"bench-{run_id}-{index}@example.com",
+                 profile_reads, record)
+
+    stop = threading.Event()
+    flooders = [threading.Thread(target=run_attack, daemon=True,
+                                 args=(make_client(0), attack_rate, stop,
+                                       record_attack))
+                for _ in range(attackers)]
+    start = time.perf_counter()
+    for thread in flooders:
+        thread.start()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(users)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for thread in flooders:
+        thread.join()
+    config = {"users": users, "concurrency": concurrency,
+              "profile_reads": profile_reads, "attackers": attackers,
+              "attack_rate": attack_rate,
+              "target": base_url or "in-process"}
+    return summarize(samples, elapsed, config, attack)
+
+
+def run_sweep(backlog: int, batch_size: int, live: int = 1000) -> Dict:
+    """
+    Time DB.sweep_expired batches over `backlog` expired tokens of each
+    kind, with `live` unexpired sessions that must survive.
+    """
+    from sqlalchemy import func, select, update
+    from db import DB, expires_in
+    from user import User
+
+    path = os.path.join(tempfile.mkdtemp(), "sweep.db")
+    db = DB("sqlite:///" + path, sweep_interval=0)
+    db.add_users_bulk((f"sweep-{index}@example.com", b"x")
+                      for index in range(backlog + live))
+    table = User.__table__
+    with db._engine.begin() as connection:
+        connection.execute(update(table).where(table.c.id <= backlog).values(
+            session_id=table.c.email, session_expires_at=expires_in(-60),
+            reset_token=table.c.email, reset_expires_at=expires_in(-60)))
+        connection.execute(update(table).where(table.c.id > backlog).values(
+            session_id=table.c.email, session_expires_at=expires_in(3600)))
+    durations = []
+    cleared = batch_size
+    while cleared >= batch_size:
+        start = time.perf_counter()
+        cleared = db.sweep_expired(batch_size)
+        durations.append(time.perf_counter() - start)
+    with db._engine.connect() as connection:
+        remaining = connection.execute(
+            select(func.count()).select_from(table)
+            .where(table.c.session_id.is_not(None))).scalar()
+    durations.sort()
+    return {
+        "backlog": backlog,
+        "batch_size": batch_size,
+        "batches": len(durations),
+        "total_seconds": sum(durations),
+        "p50_ms": percentile(durations, 0.50) * 1000,
+        "max_ms": durations[-1] * 1000,
+        "live_sessions_left": remaining,
+        "live_sessions_expected": live,
+    }
+
+
+def run_lookups(sizes: List[int], lookups: int = 2000,
+                chunk: int = 50000) -> Dict:
+    """
+    Time `lookups` random DB.find_user_by calls per column once the users
+    table holds each of `sizes` rows.
+    """
+    from db import DB
+    from user import User
+
+    path = os.path.join(tempfile.mkdtemp(), "lookups.db")
+    db = DB("sqlite:///" + path, sweep_interval=0)
+    table = User.__table__
+    values = {"email": "user-{}@example.com", "session_id": "session-{}",
+              "reset_token": "reset-{}"}
+    seeded = 0
+    results = {}
+    for size in sorted(sizes):
+        while seeded < size:
+            rows = [{"hashed_password": "x",
+                     **{column: value.format(index)
+                        for column, value in values.items()}}
+                    for index in range(seeded, min(size, seeded + chunk))]
+            with db._engine.begin() as connection:
+                connection.execute(table.insert(), rows)
+            seeded += len(rows)
+        rng = random.Random(size)
+        columns = {}
+        for column, value in values.items():
+            durations = []
+            for _ in range(lookups):
+                key = value.format(rng.randrange(size))
+                start = time.perf_counter()
+                db.find_user_by(**{column: key})
+                durations.append(time.perf_counter() - start)
+                db.remove_session()
+            durations.sort()
+            columns[column] = {
+                "p50_us": percentile(durations, 0.50) * 1e6,
+                "p99_us": percentile(durations, 0.99) * 1e6,
+            }
+        results[size] = columns
+    return results
+
+
+def run_group_commit(window_ms: float, concurrency: int, logins: int = 5000,
+                     users: int = 1000) -> Dict:
+    """
+    Time `logins` Auth.create_session calls over `concurrency` threads,
+    with group commit off and then with a `window_ms` window.
+    """
+    from auth import Auth
+    from db import DB
+
+    emails = [f"login-{index}@example.com" for index in range(users)]
+    results = {}
+    for label, window in (("off", 0), ("on", window_ms / 1000)):
+        auth = Auth(db=DB("sqlite:///" + os.path.join(
+            tempfile.mkdtemp(), f"group-commit-{label}.db"),
+            sweep_interval=0, group_commit_window=window))
+        auth._db.add_users_bulk((email, b"x") for email in emails)
+        durations = []
+
+        def login(index):
+            start = time.perf_counter()
+            auth.create_session(emails[index % users])
+            durations.append(time.perf_counter() - start)
+            auth._db.remove_session()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(login, range(logins)))
+        elapsed = time.perf_counter() - start
+        if auth._db._group_commit is not None:
+            auth._db._group_commit.flush()
+        durations.sort()
+        results[label] = {
+            "logins_per_second": logins / elapsed,
+            "p50_ms": percentile(durations, 0.50) * 1000,
+            "p99_ms": percentile(durations, 0.99) * 1000,
+        }
+    return results
+
+
+def time_to_first_response(db_url: str, timeout: float = 60) -> float:
+    """
+    Seconds from spawning app.py until GET / is answered
+    """
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    env = dict(os.environ, AUTH_DB_URL=db_url, AUTH_DB_RESET="0")
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-c", "from app import app; "
+         f"app.run(host='127.0.0.1', port={port})"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError("app.py exited during startup")
+            try:
+                with urllib.request.urlopen(
+                        f"http://127.0.0.1:{port}/", timeout=1):
+                    return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise RuntimeError("app.py did not answer in time")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def run_cold_start(runs: int) -> Dict:
+    """
+    Time `runs` server starts on a new database and on an existing one,
+    alternating between the two so drift affects both alike
+    """
+    directory = tempfile.mkdtemp()
+    existing = "sqlite:///" + os.path.join(directory, "existing.db")
+    time_to_first_response(existing)
+    durations = {"new database": [], "existing database": []}
+    for run in range(runs):
+        durations["new database"].append(time_to_first_response(
+            "sqlite:///" + os.path.join(directory, f"new-{run}.db")))
+        durations["existing database"].append(
+            time_to_first_response(existing))
+    results = {}
+    for label, values in durations.items():
+        values.sort()
+        results[label] = {
+            "min_ms": values[0] * 1000,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "max_ms": values[-1] * 1000,
+        }
+    return results
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    List steps whose p95 grew or throughput fell beyond tolerance.
+    """
+    regressions = []
+    for name, current in result["steps"].items():
+        before = baseline.get("steps", {}).get(name)
+        if before is None:
+            continue
+        if current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.1f}ms -> "
+                               f"{current['p95_ms']:.1f}ms")
+        if current["requests_per_second"] < \
+                before["requests_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {before['requests_per_second']:.1f} -> "
+                f"{current['requests_per_second']:.1f} req/s")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point, returns 1 when a regression is found.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip(),
+                                     formatter_class=argparse.
+                                     RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--profile-reads", type=int, default=10,
+                        help="GET /profile requests per logged-in user")
+    parser.add_argument("--attackers", type=int, default=0,
+                        help="threads sending registrations and failing "
+                        "logins from one address")
+    parser.add_argument("--attack-rate", type=float, default=50,
+                        help="requests per second per attacker "
+                        "(default: 50)")
+    parser.add_argument("--session-mode", choices=("db", "signed"),
+                        help="AUTH_SESSION_MODE for the in-process app")
+    parser.add_argument("--sweep-backlog", type=int, metavar="N",
+                        help="time sweeping N expired tokens instead")
+    parser.add_argument("--sweep-batch", type=int, default=500,
+                        help="rows per sweep batch (default: 500)")
+    parser.add_argument("--scaling", metavar="N,N,...",
+                        help="repeat the run at these concurrency levels, "
+                        "e.g. 1,2,4,8,16")
+    parser.add_argument("--lookup-scaling", metavar="N,N,...",
+                        help="time find_user_by at these table sizes "
+                        "instead, e.g. 100000,1000000")
+    parser.add_argument("--group-commit", type=float, metavar="MS",
+                        help="time login session writes with group commit "
+                        "off and with an MS window instead")
+    parser.add_argument("--cold-start", type=int, metavar="N",
+                        help="time N server starts until the first "
+                        "response instead")
+    parser.add_argument("--url", help="live server, e.g. "
+                        "http://127.0.0.1:5000 (default: in-process)")
+    parser.add_argument("--save", metavar="FILE",
+                        help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="fail if results regress against a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative regression (default: 0.2)")
+    args = parser.parse_args(argv)
+    if args.session_mode:
+        os.environ["AUTH_SESSION_MODE"] = args.session_mode
+    if args.scaling:
+        base = None
+        for level in (int(level) for level in args.scaling.split(",")):
+            result = run(args.users, level, args.profile_reads, args.url)
+            rate = result["requests_per_second"]
+            base = base or rate
+            login = result["steps"]["login"]
+            errors = sum(step["errors"] for step in result["steps"].values())
+            print(f"concurrency {level:>3}: {rate:8.1f} req/s "
+                  f"({rate / base:4.2f}x)  login p95="
+                  f"{login['p95_ms']:7.2f}ms  errors={errors}")
+        return 0
+    if args.lookup_scaling:
+        sizes = [int(size) for size in args.lookup_scaling.split(",")]
+        for size, columns in run_lookups(sizes).items():
+            print(f"{size:>9} users: " + "  ".join(
+                f"{column} p50={timing['p50_us']:.0f}us "
+                f"p99={timing['p99_us']:.0f}us"
+                for column, timing in columns.items()))
+        return 0
+    if args.cold_start:
+        for label, timing in run_cold_start(args.cold_start).items():
+            print(f"{label:>17}: min={timing['min_ms']:7.1f}ms "
+                  f"p50={timing['p50_ms']:7.1f}ms "
+                  f"max={timing['max_ms']:7.1f}ms")
+        return 0
+    if args.group_commit:
+        for label, timing in run_group_commit(
+                args.group_commit, args.concurrency).items():
+            print(f"group commit {label:>3}: "
+                  f"{timing['logins_per_second']:8.1f} logins/s  "
+                  f"p50={timing['p50_ms']:6.2f}ms "
+                  f"p99={timing['p99_ms']:6.2f}ms")
+        return 0
+    if args.sweep_backlog:
+        sweep = run_sweep(args.sweep_backlog, args.sweep_batch)
+        print(f"swept {sweep['backlog']} expired tokens of each kind in "
+              f"{sweep['batches']} batches of {sweep['batch_size']}: "
+              f"{sweep['total_seconds']:.2f}s total, "
+              f"p50={sweep['p50_ms']:.2f}ms max={sweep['max_ms']:.2f}ms "
+              f"per batch, {sweep['live_sessions_left']}/"
+              f"{sweep['live_sessions_expected']} live sessions kept")
+        return 0
+
+    result = run(args.users, args.concurrency, args.profile_reads, args.url,
+                 args.attackers, args.attack_rate)
+    print(f"{result['requests']} requests in "
+          f"{result['elapsed_seconds']:.2f}s "
+          f"({result['requests_per_second']:.1f} req/s)")
+    for name, step in result["steps"].items():
+        print(f"  {name:<16} n={step['count']:<6} err={step['errors']:<4} "
+              f"p50={step['p50_ms']:7.2f}ms p95={step['p95_ms']:7.2f}ms "
+              f"p99={step['p99_ms']:7.2f}ms")
+    if "attack" in result:
+        attack = result["attack"]
+        print(f"  {'attack':<16} n={attack['count']:<6} "
+              f"rejected={attack['rejected']:<6} "
+              f"p50={attack['p50_ms']:7.2f}ms")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for line in regressions:
+            print("REGRESSION " + line, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,36 +1,370 @@
 #!/usr/bin/env python3
 """DB module
 """
-from sqlalchemy import create_engine
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import (bindparam, create_engine, event, inspect, select,
+                        update)
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.orm.session import Session
 
 from sqlalchemy.exc import InvalidRequestError
+from metrics import Span, timed
 from user import Base, User
 from sqlalchemy.orm.exc import NoResultFound
 
 
+DB_URL = os.getenv("AUTH_DB_URL", "sqlite:///a.db")
+DB_RESET = os.getenv("AUTH_DB_RESET", "0") == "1"
+GROUP_COMMIT_WINDOW = float(os.getenv("AUTH_GROUP_COMMIT_MS", 0)) / 1000
+GROUP_COMMIT_RETRIES = int(os.getenv("AUTH_GROUP_COMMIT_RETRIES", 5))
+SESSION_TTL = float(os.getenv("AUTH_SESSION_TTL", 86400))
+RESET_TOKEN_TTL = float(os.getenv("AUTH_RESET_TOKEN_TTL", 900))
+SWEEP_INTERVAL = float(os.getenv("AUTH_SWEEP_INTERVAL", 60))
+SWEEP_BATCH = int(os.getenv("AUTH_SWEEP_BATCH", 500))
+SWEEP_PAUSE = float(os.getenv("AUTH_SWEEP_PAUSE_MS", 50)) / 1000
+
+SCHEMA_VERSION = 3
+
+# token column -> its expiry column
+EXPIRING_COLUMNS = {
+    "session_id": "session_expires_at",
+    "reset_token": "reset_expires_at",
+}
+TOKEN_TTLS = {
+    "session_id": SESSION_TTL,
+    "reset_token": RESET_TOKEN_TTL,
+}
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+
+log = logging.getLogger(__name__)
+for _pragma in filter(None, os.getenv("AUTH_SQLITE_PRAGMAS", "").split(",")):
+    _name, _, _value = _pragma.partition("=")
+    SQLITE_PRAGMAS[_name.strip()] = _value.strip()
+
+
+def utcnow() -> datetime:
+    """Current UTC time as the naive datetime stored in expiry columns
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def expires_in(seconds: float) -> datetime:
+    """Expiry time `seconds` from now
+    """
+    return utcnow() + timedelta(seconds=seconds)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Apply SQLITE_PRAGMAS to every new pooled connection
+    """
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _pool_arguments(url: str, **pool_options) -> dict:
+    """pool_options if url's dialect pools with a QueuePool, else nothing
+
+    In-memory SQLite uses a SingletonThreadPool, which rejects size and
+    overflow settings.
+    """
+    url = make_url(url)
+    if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+        return pool_options
+    return {}
+
+
+def _ensure_schema(engine, reset: bool = False) -> None:
+    """Create or migrate the schema unless it is already current
+    """
+    with engine.begin() as connection:
+        _migrate(connection, reset)
+
+
+def _migrate(connection, reset: bool = False) -> None:
+    """Bring the schema on connection up to SCHEMA_VERSION
+
+    On SQLite the version lives in PRAGMA user_version, so an up-to-date
+    database costs a single pragma read. Creation is idempotent and also
+    adds indexes missing from tables made by older versions. reset drops
+    every table first.
+    """
+    is_sqlite = connection.dialect.name == "sqlite"
+    if reset:
+        Base.metadata.drop_all(connection)
+    elif is_sqlite:
+        version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+        if version == SCHEMA_VERSION:
+            return
+    Base.metadata.create_all(connection)
+    _add_missing_columns(connection)
+    for index in User.__table__.indexes:
+        index.create(connection, checkfirst=True)
+    _backfill_expiry(connection)
+    if is_sqlite:
+        connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def _add_missing_columns(connection) -> None:
+    """Add columns of the users table that an older schema lacks
+
+    New columns must be nullable or carry a server default.
+    """
+    table = User.__table__
+    existing = {column["name"]
+                for column in inspect(connection).get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in existing:
+            ddl = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+
+
+def _backfill_expiry(connection) -> None:
+    """Give tokens issued before expiry columns existed a full lifetime
+    """
+    for column, expiry in EXPIRING_COLUMNS.items():
+        table = User.__table__
+        connection.execute(
+            update(table)
+            .where(table.c[column].is_not(None), table.c[expiry].is_(None))
+            .values({expiry: expires_in(TOKEN_TTLS[column])}))
+
+
+class GroupCommitter:
+    """Write-behind buffer for the session and reset-token columns.
+
+    Updates are merged per user and written by a background thread every
+    `window` seconds (or sooner once `max_batch` users are pending), all
+    in one transaction. Until then DB.find_user_by overlays the pending
+    values, so readers in this process see writes immediately.
+
+    A batch that fails to commit is logged and retried on the next
+    window. After `max_retries` failures in a row it is dropped, so the
+    overlay stops serving sessions and tokens the database never
+    received; `dropped` counts the users discarded that way.
+    """
+
+    COLUMNS = ("session_id", "session_expires_at",
+               "reset_token", "reset_expires_at")
+
+    def __init__(self, engine, window: float, max_batch: int = 256,
+                 max_retries: int = GROUP_COMMIT_RETRIES) -> None:
+        """Start the flusher thread
+        """
+        self.window = window
+        self.max_batch = max_batch
+        self.max_retries = max(1, max_retries)
+        self.dropped = 0
+        self._engine = engine
+        self._pending = {}
+        self._owners = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        thread = threading.Thread(target=self._run, name="group-commit",
+                                  daemon=True)
+        thread.start()
+        atexit.register(self.flush)
+
+    def stage(self, user_id: int, values: Dict[str, Optional[str]]) -> None:
+        """Queue column updates for user_id
+        """
+        with self._lock:
+            current = self._pending.get(user_id, {})
+            for key, value in values.items():
+                old = current.get(key)
+                if old is not None and \
+                        self._owners.get((key, old)) == user_id:
+                    del self._owners[(key, old)]
+                if value is not None:
+                    self._owners[(key, value)] = user_id
+            self._pending[user_id] = {**current, **values}
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.set()
+
+    def pending(self, user_id: int) -> Optional[Dict[str, Optional[str]]]:
+        """Uncommitted values for user_id, if any
+        """
+        return self._pending.get(user_id)
+
+    def owner(self, key: str, value: str) -> Optional[int]:
+        """Id of the user with an uncommitted key=value, if any
+        """
+        return self._owners.get((key, value))
+
+    def flush(self) -> None:
+        """Commit everything pending in a single transaction
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = dict(self._pending)
+            if batch:
+                self._write(batch)
+                self._forget(batch)
+
+    def _write(self, batch: Dict[int, Dict[str, Optional[str]]]) -> None:
+        """Update every user of batch in one transaction
+        """
+        groups = {}
+        for user_id, values in batch.items():
+            groups.setdefault(tuple(sorted(values)), []).append(
+                {"_id": user_id, **values})
+        table = User.__table__
+        with Span("group_commit"), self._engine.begin() as connection:
+            for keys, rows in groups.items():
+                statement = table.update().where(
+                    table.c.id == bindparam("_id")).values(
+                    {key: bindparam(key) for key in keys})
+                connection.execute(statement, rows)
+
+    def _forget(self, batch: Dict[int, Dict[str, Optional[str]]]) -> None:
+        """Stop overlaying the values of batch not restaged since
+        """
+        with self._lock:
+            for user_id, values in batch.items():
+                if self._pending.get(user_id) is not values:
+                    continue
+                del self._pending[user_id]
+                for key, value in values.items():
+                    if self._owners.get((key, value)) == user_id:
+                        del self._owners[(key, value)]
+
+    def _run(self) -> None:
+        """Flush every window, retrying a failed batch up to max_retries
+        """
+        failures = 0
+        while True:
+            self._wakeup.wait(self.window)
+            self._wakeup.clear()
+            with self._flush_lock:
+                with self._lock:
+                    batch = dict(self._pending)
+                if not batch:
+                    continue
+                try:
+                    self._write(batch)
+                except Exception:
+                    failures += 1
+                    if failures < self.max_retries:
+                        log.warning("group commit of %d users failed "
+                                    "(attempt %d of %d), retrying",
+                                    len(batch), failures, self.max_retries,
+                                    exc_info=True)
+                        continue
+                    log.error("group commit of %d users failed %d times, "
+                              "dropping the batch", len(batch), failures,
+                              exc_info=True)
+                    self.dropped += len(batch)
+                failures = 0
+                self._forget(batch)
+
+
+class ExpirySweeper:
+    """Background thread clearing expired sessions and reset tokens.
+
+    Each pass clears at most `batch_size` rows per token in its own short
+    transaction, found through the expiry index, and sleeps `pause`
+    seconds between full batches so a large backlog is worked off
+    without holding the write lock for long. Once a pass finds less than
+    a full batch, or fails (which is logged), it waits `interval` seconds.
+    """
+
+    def __init__(self, db: "DB", interval: float, batch_size: int,
+                 pause: float) -> None:
+        """Start the sweeper thread
+        """
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self._db = db
+        thread = threading.Thread(target=self._run, name="expiry-sweeper",
+                                  daemon=True)
+        thread.start()
+
+    def _run(self) -> None:
+        """Sweep forever, pausing between batches and between passes
+        """
+        while True:
+            try:
+                cleared = self._db.sweep_expired(self.batch_size)
+            except Exception:
+                log.exception("expiry sweep failed, retrying in %.0fs",
+                              self.interval)
+                cleared = 0
+            time.sleep(self.pause if cleared >= self.batch_size
+                       else self.interval)
+
+
 class DB:
     """DB class
     """
 
-    def __init__(self) -> None:
+    def __init__(self, url: str = DB_URL, reset: bool = DB_RESET,
+                 pool_size: int = 5, max_overflow: int = 10,
+                 pool_pre_ping: bool = True,
+                 group_commit_window: float = GROUP_COMMIT_WINDOW,
+                 sweep_interval: float = SWEEP_INTERVAL) -> None:
         """Initialize a new DB instance
+
+        The existing database at url is kept and only created or migrated
+        when its schema is out of date; reset drops it first. A positive
+        group_commit_window batches session_id and reset_token updates
+        through a GroupCommitter, and a positive sweep_interval starts an
+        ExpirySweeper. pool_size and max_overflow only apply to databases
+        pooled with a QueuePool.
         """
-        self._engine = create_engine("sqlite:///a.db", echo=False)
-        Base.metadata.drop_all(self._engine)
-        Base.metadata.create_all(self._engine)
-        self.__session = None
+        self._engine = create_engine(
+            url, echo=False, pool_pre_ping=pool_pre_ping,
+            **_pool_arguments(url, pool_size=pool_size,
+                              max_overflow=max_overflow))
+        if self._engine.dialect.name == "sqlite":
+            event.listen(self._engine, "connect", _set_sqlite_pragmas)
+        _ensure_schema(self._engine, reset)
+        self.__session = scoped_session(sessionmaker(bind=self._engine))
+        self._group_commit = None
+        if group_commit_window > 0:
+            self._group_commit = GroupCommitter(self._engine,
+                                                group_commit_window)
+        self._sweeper = None
+        if sweep_interval > 0:
+            self._sweeper = ExpirySweeper(self, sweep_interval, SWEEP_BATCH,
+                                          SWEEP_PAUSE)
 
     @property
     def _session(self) -> Session:
-        """Memoized session object
+        """Session bound to the calling thread
+        """
+        return self.__session()
+
+    def remove_session(self) -> None:
+        """Close and discard the calling thread's session
         """
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        self.__session.remove()
+
+    def detach(self, user: User) -> None:
+        """Expunge user so it can be shared outside the thread's session
+        """
+        self._session.expunge(user)
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """ adds user to database
@@ -40,19 +374,114 @@ class DB:
         self._session.commit()
         return user
 
+    def existing_emails(self, emails: Iterable[str]) -> Set[str]:
+        """ emails already registered, in one indexed query
+        """
+        emails = list(emails)
+        if not emails:
+            return set()
+        query = select(User.email).where(User.email.in_(emails))
+        with self._engine.connect() as connection:
+            return set(connection.execute(query).scalars())
+
+    def add_users_bulk(self, users: Iterable[Tuple[str, bytes]],
+                       skip_existing: bool = True) -> int:
+        """ inserts many users in one transaction
+
+        Repeated emails are skipped, as are emails already stored unless
+        skip_existing is False (for callers that checked themselves).
+        Returns the number of rows inserted.
+        """
+        rows = {}
+        for email, hashed_password in users:
+            rows.setdefault(email, hashed_password)
+        if not rows:
+            return 0
+        table = User.__table__
+        with self._engine.begin() as connection:
+            existing = set()
+            if skip_existing:
+                query = select(table.c.email).where(
+                    table.c.email.in_(list(rows)))
+                existing = set(connection.execute(query).scalars())
+            new_rows = [{"email": email, "hashed_password": hashed_password}
+                        for email, hashed_password in rows.items()
+                        if email not in existing]
+            if new_rows:
+                connection.execute(table.insert(), new_rows)
+        return len(new_rows)
+
+    def sweep_expired(self, batch_size: int = SWEEP_BATCH,
+                      now: Optional[datetime] = None) -> int:
+        """ clears up to batch_size expired tokens of each kind
+
+        Returns the largest number of rows cleared for one kind, so a
+        result equal to batch_size means more may be left.
+        """
+        now = now or utcnow()
+        table = User.__table__
+        cleared = 0
+        for column, expiry in EXPIRING_COLUMNS.items():
+            expired = select(table.c.id).where(table.c[expiry] < now) \
+                .order_by(table.c[expiry]).limit(batch_size)
+            with Span("sweep"), self._engine.begin() as connection:
+                ids = list(connection.execute(expired).scalars())
+                if not ids:
+                    continue
+                connection.execute(
+                    update(table)
+                    .where(table.c.id.in_(ids), table.c[expiry] < now)
+                    .values({column: None, expiry: None}))
+            cleared = max(cleared, len(ids))
+        return cleared
+
+    @timed("find_user_by")
     def find_user_by(self, **kwargs) -> User:
-        """ find user function """
-        users = self._session.query(User)
+        """ find user function
+
+        A token column never matches None: filter_by would turn it into
+        IS NULL and return any user without a token.
+        """
         for key, value in kwargs.items():
             if key not in User.__dict__:
                 raise InvalidRequestError
-            for user in users:
-                if getattr(user, key) == value:
-                    return user
+            if value is None and key in EXPIRING_COLUMNS:
                 raise NoResultFound
+        if self._group_commit is not None:
+            return self._find_user_with_pending(kwargs)
+        user = self._session.query(User).filter_by(**kwargs).first()
+        if user is None:
+            raise NoResultFound
+        return user
+
+    def _find_user_with_pending(self, kwargs: dict) -> User:
+        """find_user_by that sees values still queued for group commit
+        """
+        group_commit = self._group_commit
+        filters = dict(kwargs)
+        for key in GroupCommitter.COLUMNS:
+            if filters.get(key) is None:
+                continue
+            owner = group_commit.owner(key, filters[key])
+            if owner is not None:
+                del filters[key]
+                if filters.setdefault("id", owner) != owner:
+                    raise NoResultFound
+        for user in self._session.query(User).filter_by(**filters):
+            for key, value in (group_commit.pending(user.id) or {}).items():
+                set_committed_value(user, key, value)
+            if all(getattr(user, key) == value
+                   for key, value in kwargs.items()):
+                return user
+        raise NoResultFound
 
     def update_user(self, user_id: int, **kwargs) -> None:
         ''' update user '''
+        if self._group_commit is not None:
+            if kwargs and set(kwargs) <= set(GroupCommitter.COLUMNS):
+                self._group_commit.stage(user_id, kwargs)
+                return
+            self._group_commit.flush()
         try:
             id = user_id
             users = self.find_user_by(id=user_id)
@@ -63,3 +492,5 @@ class DB:
                 setattr(users, key, value)
             else:
                 raise ValueError
+        with Span("session_commit"):
+            self._session.commit()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Bulk import of users from CSV or JSONL into the auth database
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+import bcrypt
+from auth import BCRYPT_ROUNDS
+from db import DB
+
+BCRYPT_HASH = re.compile(r"\$2[aby]\$\d\d\$[./A-Za-z0-9]{53}")
+
+
+def read_records(path: str, fmt: Optional[str] = None) -> Iterator[Dict]:
+    """Stream records with an email and a password or hashed_password
+    """
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+    with open(path, newline="") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def hash_record(record: Dict) -> Optional[bytes]:
+    """bcrypt hash for a record, reusing it if already hashed
+
+    Empty cells count as missing. A hashed_password must be a well-formed
+    bcrypt hash, as must a password to be taken as one; any other
+    password is hashed. Returns None for a record without a usable
+    password, which the caller rejects.
+    """
+    hashed = (record.get("hashed_password") or "").strip()
+    password = record.get("password") or ""
+    if hashed:
+        return hashed.encode("utf-8") if BCRYPT_HASH.fullmatch(hashed) \
+            else None
+    if BCRYPT_HASH.fullmatch(password):
+        return password.encode("utf-8")
+    if not password:
+        return None
+    return bcrypt.hashpw(password.encode("utf-8"),
+                         bcrypt.gensalt(BCRYPT_ROUNDS))
+
+
+def read_checkpoint(path: str) -> int:
+    """Number of input records already imported
+    """
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(path: str, done: int) -> None:
+    """Atomically record how many input records are imported
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(done))
+    os.replace(tmp_path, path)
+
+
+def import_users(db: DB, path: str, batch_size: int = 1000,
+                 workers: Optional[int] = None, fmt: Optional[str] = None,
+                 checkpoint: Optional[str] = None) -> int:
+    """Import users from path, batch by batch, resuming from checkpoint
+
+    Each batch costs one indexed query for existing emails, parallel
+    hashing of the new ones and one executemany insert transaction.
+    Records without a usable password are counted as rejected and
+    skipped. Returns the number of users inserted.
+    """
+    checkpoint = checkpoint or path + ".checkpoint"
+    done = skipped = read_checkpoint(checkpoint)
+    records = islice(read_records(path, fmt), done, None)
+    inserted = rejected = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        while True:
+            batch: List[Dict] = list(islice(records, batch_size))
+            if not batch:
+                break
+            existing = db.existing_emails(r["email"] for r in batch)
+            seen = set(existing)
+            new = []
+            for record in batch:
+                if record["email"] not in seen:
+                    seen.add(record["email"])
+                    new.append(record)
+            rows = [(r["email"], h)
+                    for r, h in zip(new, pool.map(hash_record, new))]
+            valid = [row for row in rows if row[1] is not None]
+            rejected += len(rows) - len(valid)
+            inserted += db.add_users_bulk(valid, skip_existing=False)
+            done += len(batch)
+            write_checkpoint(checkpoint, done)
+            rate = (done - skipped) / max(time.perf_counter() - start, 1e-9)
+            print(f"{done} rows read, {inserted} inserted, {rejected} "
+                  f"rejected ({rate:.0f} rows/s)", file=sys.stderr)
+    return inserted
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", help="CSV or JSONL file of users")
+    parser.add_argument("--format", choices=("csv", "jsonl"))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="hashing threads (default: CPU count)")
+    parser.add_argument("--checkpoint",
+                        help="resume file (default: PATH.checkpoint)")
+    args = parser.parse_args(argv)
+    import_users(DB(), args.path, args.batch_size, args.workers,
+                 args.format, args.checkpoint)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Low-overhead request and stage metrics in Prometheus text format
+"""
+import threading
+import weakref
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REQUEST_METRIC = "http_request_duration_seconds"
+STAGE_METRIC = "auth_stage_duration_seconds"
+
+_local = threading.local()
+_shards: List[Dict] = []
+_retired: Dict = {}
+_shards_lock = threading.Lock()
+
+
+def _merge(into: Dict, shard: Dict) -> None:
+    """Add every series of shard to into
+    """
+    for key, series in shard.items():
+        total = into.get(key)
+        if total is None:
+            into[key] = list(series)
+        else:
+            for i, value in enumerate(series):
+                total[i] += value
+
+
+def _retire(shard: Dict) -> None:
+    """Fold a finished thread's shard into the retired totals
+    """
+    with _shards_lock:
+        for i, live in enumerate(_shards):
+            if live is shard:
+                del _shards[i]
+                break
+        _merge(_retired, shard)
+
+
+def _shard() -> Dict:
+    """The calling thread's private series, created on first use
+    """
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = {}
+        with _shards_lock:
+            _shards.append(shard)
+        weakref.finalize(threading.current_thread(), _retire, shard)
+    return shard
+
+
+def observe(name: str, labels: Tuple[Tuple[str, str], ...],
+            seconds: float) -> None:
+    """Record one duration in the histogram name{labels}
+
+    Each thread writes to its own shard, so no lock is taken.
+    """
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _shard()
+    key = (name, labels)
+    series = shard.get(key)
+    if series is None:
+        series = shard[key] = [0.0, 0] + [0] * (len(BUCKETS) + 1)
+    series[0] += seconds
+    series[1] += 1
+    series[2 + bisect_left(BUCKETS, seconds)] += 1
+
+
+def timed(stage: str) -> Callable:
+    """Decorator timing every call of a function as a stage
+    """
+    labels = (("stage", stage),)
+
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(STAGE_METRIC, labels, perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class Span:
+    """Context manager timing a block as a stage
+    """
+    __slots__ = ("labels", "start")
+
+    def __init__(self, stage: str) -> None:
+        self.labels = (("stage", stage),)
+
+    def __enter__(self) -> "Span":
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        observe(STAGE_METRIC, self.labels, perf_counter() - self.start)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], **extra) -> str:
+    """Render {k="v",...}
+    """
+    pairs = list(labels) + list(extra.items())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render() -> str:
+    """All series in Prometheus text exposition format
+    """
+    totals: Dict = {}
+    with _shards_lock:
+        _merge(totals, _retired)
+        for shard in _shards:
+            _merge(totals, dict(shard))
+    lines = []
+    requests = sorted((k, v) for k, v in totals.items()
+                      if k[0] == REQUEST_METRIC)
+    if requests:
+        lines.append("# TYPE http_requests_total counter")
+        for (_, labels), series in requests:
+            lines.append(
+                f"http_requests_total{_format_labels(labels)} {series[1]}")
+    for name in sorted({name for name, _ in totals}):
+        lines.append(f"# TYPE {name} histogram")
+        for (series_name, labels), series in sorted(totals.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), series[2:]):
+                cumulative += count
+                lines.append(f"{name}_bucket"
+                             f"{_format_labels(labels, le=bound)} "
+                             f"{cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {series[0]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {series[1]}")
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app) -> None:
+    """Time every request of a Flask app and serve GET /metrics
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            rule = request.url_rule
+            labels = (("method", request.method),
+                      ("route", rule.rule if rule else "unmatched"),
+                      ("status", str(response.status_code)))
+            observe(REQUEST_METRIC, labels, perf_counter() - start)
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        """Prometheus scrape endpoint"""
+        return Response(render(),
+                        mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""On-demand stack-sampling profiler for the Flask app
+"""
+import atexit
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+PROFILE_SAMPLE = float(os.getenv("AUTH_PROFILE_SAMPLE", 0))
+PROFILE_TOKEN = os.getenv("AUTH_PROFILE_TOKEN", "")
+PROFILE_INTERVAL = float(os.getenv("AUTH_PROFILE_INTERVAL_MS", 2)) / 1000
+PROFILE_DIR = os.getenv("AUTH_PROFILE_DIR", "profiles")
+PROFILE_HEADER = "X-Profile"
+
+
+def _label(frame) -> str:
+    """module:function name of a frame, as shown in a flame graph
+    """
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{frame.f_globals.get('__name__', '?')}:{name}"
+
+
+class Profiler:
+    """Samples the stacks of selected request threads.
+
+    While at least one request is being profiled, a background thread
+    reads every profiled thread's current frame each `interval` seconds
+    and counts the stack, from the view down, per route. Stacks are kept
+    as folded lines ("a;b;c count") that flamegraph.pl, speedscope and
+    similar tools read directly.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL) -> None:
+        """Create an idle profiler; the sampler starts on first use
+        """
+        self.interval = interval
+        self.samples: Dict[str, Counter] = {}
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self, route: str, stop_frame=None) -> None:
+        """Profile the calling thread as route until stop() is called
+
+        Frames at and above stop_frame are left out of its stacks.
+        """
+        with self._lock:
+            self._targets[threading.get_ident()] = (route, stop_frame)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        """Stop profiling the calling thread
+        """
+        ident = threading.get_ident()
+        if ident in self._targets:
+            with self._lock:
+                self._targets.pop(ident, None)
+
+    def _run(self) -> None:
+        """Sample the targets' stacks, sleeping while there are none
+        """
+        while True:
+            with self._lock:
+                targets = list(self._targets.items())
+            if not targets:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            frames = sys._current_frames()
+            stacks = []
+            for ident, (route, stop_frame) in targets:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None and frame is not stop_frame:
+                    stack.append(_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    stacks.append((route, ";".join(reversed(stack))))
+            del frames
+            with self._lock:
+                for route, stack in stacks:
+                    self.samples.setdefault(route, Counter())[stack] += 1
+            time.sleep(self.interval)
+
+    def folded(self, route: Optional[str] = None) -> str:
+        """Folded stacks of one route, or of all with the route as root
+        """
+        with self._lock:
+            if route is not None:
+                counts = dict(self.samples.get(route, {}))
+                return "".join(f"{stack} {count}\n"
+                               for stack, count in counts.items())
+            return "".join(f"{name};{stack} {count}\n"
+                           for name, counts in self.samples.items()
+                           for stack, count in counts.items())
+
+    def dump(self, directory: str = PROFILE_DIR) -> None:
+        """Write one <route>.folded file per profiled route
+        """
+        with self._lock:
+            routes = list(self.samples)
+        if routes:
+            os.makedirs(directory, exist_ok=True)
+        for route in routes:
+            name = re.sub(r"[^A-Za-z0-9_.-]+", "_", route).strip("_")
+            with open(os.path.join(directory, f"{name}.folded"), "w") as f:
+                f.write(self.folded(route))
+
+    def reset(self) -> None:
+        """Forget every sample
+        """
+        with self._lock:
+            self.samples.clear()
+
+
+PROFILER = Profiler()
+
+
+def init_app(app, sample: float = PROFILE_SAMPLE,
+             token: str = PROFILE_TOKEN,
+             directory: str = PROFILE_DIR) -> None:
+    """Profile a sampled fraction of requests, and any request whose
+    X-Profile header matches token
+
+    With sample at 0 and no token nothing is registered, so the app runs
+    exactly as without profiling. With a token, GET /debug/profile returns
+    the folded stacks of every route to requests carrying that header.
+    Files are written to directory on exit.
+    """
+    from flask import Response, abort, request
+
+    if sample <= 0 and not token:
+        return
+    secret = token.encode("utf-8")
+
+    def authorized() -> bool:
+        header = request.headers.get(PROFILE_HEADER)
+        return bool(secret) and header is not None and hmac.compare_digest(
+            header.encode("utf-8"), secret)
+
+    @app.before_request
+    def _start_profile():
+        if not (sample > 0 and random.random() < sample) and \
+                not authorized():
+            return
+        stop_frame = sys._getframe(1)
+        while stop_frame is not None and \
+                stop_frame.f_code.co_name != "full_dispatch_request":
+            stop_frame = stop_frame.f_back
+        rule = request.url_rule
+        PROFILER.start(f"{request.method} {rule.rule if rule else '-'}",
+                       stop_frame)
+
+    @app.teardown_request
+    def _stop_profile(exception=None):
+        PROFILER.stop()
+
+    if token:
+        @app.route("/debug/profile", methods=["GET"])
+        def debug_profile():
+            """Folded stacks of every profiled route"""
+            if not authorized():
+                abort(404)
+            return Response(PROFILER.folded(), mimetype="text/plain")
+
+    atexit.register(PROFILER.dump, directory)
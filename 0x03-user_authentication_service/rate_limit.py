@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Token-bucket admission control for endpoints that check credentials.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+RATE_LIMIT_IP_RATE = float(os.getenv("AUTH_RATE_LIMIT_IP_RATE", 5))
+RATE_LIMIT_IP_BURST = float(os.getenv("AUTH_RATE_LIMIT_IP_BURST", 20))
+RATE_LIMIT_EMAIL_RATE = float(os.getenv("AUTH_RATE_LIMIT_EMAIL_RATE", 0.2))
+RATE_LIMIT_EMAIL_BURST = float(os.getenv("AUTH_RATE_LIMIT_EMAIL_BURST", 5))
+RATE_LIMIT_SIZE = int(os.getenv("AUTH_RATE_LIMIT_SIZE", 100000))
+RATE_LIMIT_SHARDS = 64
+
+
+class RateLimited(Exception):
+    """Raised when a key has no token left
+
+    Attributes:
+        retry_after: Seconds until the next token is available.
+    """
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("rate limited")
+        self.retry_after = retry_after
+
+
+class _Shard:
+    """One lock and the buckets whose keys hash to it, oldest first"""
+
+    __slots__ = ("lock", "buckets")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()
+
+
+class RateLimiter:
+    """
+    Token buckets keyed by client IP, email or any hashable value.
+
+    Buckets are refilled lazily from the time of their last use, so idle
+    keys cost nothing. Keys are spread over shards that each have their
+    own lock and hold at most max_entries / shards buckets; the bucket
+    idle for longest is evicted first, which only forgets a client that
+    was close to a full bucket anyway.
+
+    Attributes:
+        rate: Tokens added per second, 0 disables the limiter.
+        burst: Bucket capacity.
+        max_entries: Maximum number of buckets kept across all shards.
+        rejected: Requests refused because their bucket was empty.
+        evictions: Buckets dropped to stay within max_entries.
+    """
+
+    def __init__(self, rate: float, burst: float,
+                 max_entries: int = RATE_LIMIT_SIZE,
+                 shards: int = RATE_LIMIT_SHARDS) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_entries = max_entries
+        self.rejected = 0
+        self.evictions = 0
+        self._per_shard = max(1, max_entries // shards)
+        self._shards = [_Shard() for _ in range(shards)]
+        self._idle = burst / rate if rate > 0 else 0
+
+    def hit(self, key: Hashable) -> None:
+        """Take one token from key's bucket or raise RateLimited"""
+        self._take(key, 1, 1)
+
+    def check(self, key: Hashable) -> None:
+        """Raise RateLimited if key's bucket is empty, without taking"""
+        self._take(key, 0, 1)
+
+    def penalize(self, key: Hashable, cost: float = 1) -> None:
+        """Take up to cost tokens from key's bucket, never raising"""
+        self._take(key, cost, 0)
+
+    def _take(self, key: Hashable, cost: float, need: float) -> None:
+        """Refill key's bucket, then take cost tokens if it holds need"""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            buckets = shard.buckets
+            bucket = buckets.get(key)
+            if bucket is None:
+                tokens = self.burst
+                self._evict(buckets, now)
+            else:
+                tokens = min(self.burst,
+                             bucket[0] + (now - bucket[1]) * self.rate)
+                buckets.move_to_end(key)
+            if tokens < need:
+                buckets[key] = (tokens, now)
+                self.rejected += 1
+                raise RateLimited((need - tokens) / self.rate)
+            buckets[key] = (max(0.0, tokens - cost), now)
+
+    def _evict(self, buckets: OrderedDict, now: float) -> None:
+        """Drop refilled buckets, then the idlest ones while the shard is full
+
+        Buckets are kept in order of last use, so both kinds sit at the
+        front.
+        """
+        while buckets:
+            key, (tokens, stamp) = next(iter(buckets.items()))
+            if now - stamp < self._idle:
+                break
+            del buckets[key]
+        while len(buckets) >= self._per_shard:
+            buckets.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        """Number of buckets currently held"""
+        return sum(len(shard.buckets) for shard in self._shards)
+
+    def clear(self) -> None:
+        """Forget every bucket"""
+        for shard in self._shards:
+            with shard.lock:
+                shard.buckets.clear()
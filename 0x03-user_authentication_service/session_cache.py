@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Bounded in-memory cache of users keyed by session ID.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from user import User
+
+
+SESSION_CACHE_SIZE = int(os.getenv("AUTH_SESSION_CACHE_SIZE", 10000))
+SESSION_CACHE_TTL = float(os.getenv("AUTH_SESSION_CACHE_TTL", 1))
+SIGNED_USER_CACHE_TTL = float(os.getenv("AUTH_SIGNED_USER_CACHE_TTL", 1))
+
+
+class SessionCache:
+    """
+    LRU cache of detached User objects with per-entry TTL.
+
+    Attributes:
+        max_entries: Maximum number of cached sessions, 0 disables caching.
+        ttl: Seconds an entry stays valid after it is stored.
+        hits: Lookups answered from the cache.
+        misses: Lookups that were absent or expired.
+        evictions: Entries dropped to stay within max_entries.
+    """
+
+    def __init__(self, max_entries: int = SESSION_CACHE_SIZE,
+                 ttl: float = SESSION_CACHE_TTL) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """Counter bumped by every invalidation, used to reject stale fills"""
+        return self._version
+
+    def get(self, session_id: str) -> Optional[User]:
+        """Return the cached user for session_id, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user = entry
+            if expires_at <= now:
+                self._discard(session_id)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return user
+
+    def put(self, session_id: str, user: User, version: int) -> None:
+        """Cache user under session_id unless invalidated since version"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if version != self._version:
+                return
+            previous = self._by_user.get(user.id)
+            if previous is not None:
+                self._discard(previous)
+            self._entries[session_id] = (time.monotonic() + self.ttl, user)
+            self._by_user[user.id] = session_id
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop any cached session belonging to user_id"""
+        with self._lock:
+            self._version += 1
+            session_id = self._by_user.get(user_id)
+            if session_id is not None:
+                self._discard(session_id)
+
+    def clear(self) -> None:
+        """Drop every cached entry"""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of the cache counters"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _discard(self, session_id: str) -> None:
+        """Remove session_id, caller must hold the lock"""
+        _, user = self._entries.pop(session_id)
+        if self._by_user.get(user.id) == session_id:
+            del self._by_user[user.id]
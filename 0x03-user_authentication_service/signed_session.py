@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Stateless session tokens signed with HMAC-SHA256.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+from db import SESSION_TTL
+
+
+SESSION_MODE = os.getenv("AUTH_SESSION_MODE", "db")
+SESSION_KEYS = os.getenv("AUTH_SESSION_KEYS", "")
+
+
+class Claims(NamedTuple):
+    """Fields carried by a verified token"""
+    user_id: int
+    issued_at: int
+    generation: int
+
+
+def _parse_keys(spec: str) -> List[Tuple[str, bytes]]:
+    """Turn "kid:secret,kid:secret" into (kid, secret) pairs, newest first"""
+    keys = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        kid, sep, secret = item.partition(":")
+        if not sep or not kid or not secret or "." in kid:
+            raise ValueError(f"bad session key {kid!r}, expected kid:secret")
+        keys.append((kid, secret.encode("utf-8")))
+    return keys
+
+
+class SessionSigner:
+    """
+    Issues and verifies tokens of the form
+
+        <kid>.<user id>.<issued at>.<generation>.<signature>
+
+    The first key signs; every key verifies, so a new key can be put in
+    front and the old ones dropped once their tokens have expired. Without
+    configured keys a random per-process key is used, which invalidates
+    every token on restart.
+
+    Attributes:
+        ttl: Seconds a token stays valid after it is issued.
+    """
+
+    def __init__(self, keys: Optional[List[Tuple[str, bytes]]] = None,
+                 ttl: float = SESSION_TTL) -> None:
+        if keys is None:
+            keys = _parse_keys(SESSION_KEYS)
+        if not keys:
+            keys = [("0", os.urandom(32))]
+        self.ttl = ttl
+        self._keys = list(keys)
+        self._by_kid = dict(self._keys)
+        self._lock = threading.Lock()
+
+    def rotate(self, kid: str, secret: bytes, keep: int = 2) -> None:
+        """Sign with a new key from now on, still verifying `keep` older"""
+        with self._lock:
+            keys = [(kid, secret)] + [key for key in self._keys
+                                      if key[0] != kid][:keep]
+            self._keys = keys
+            self._by_kid = dict(keys)
+
+    @staticmethod
+    def _mac(secret: bytes, payload: str) -> str:
+        """Unpadded base64url HMAC-SHA256 of payload"""
+        digest = hmac.new(secret, payload.encode("utf-8"),
+                          hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+    def sign(self, user_id: int, generation: int,
+             issued_at: Optional[int] = None) -> str:
+        """Token for user_id at the given session generation"""
+        if issued_at is None:
+            issued_at = int(time.time())
+        kid, secret = self._keys[0]
+        payload = f"{kid}.{user_id}.{issued_at}.{generation}"
+        return f"{payload}.{self._mac(secret, payload)}"
+
+    def verify(self, token: str) -> Optional[Claims]:
+        """Claims of a well-formed, correctly signed, unexpired token"""
+        if not isinstance(token, str):
+            return None
+        payload, _, signature = token.rpartition(".")
+        kid, _, rest = payload.partition(".")
+        secret = self._by_kid.get(kid)
+        if secret is None or not hmac.compare_digest(
+                self._mac(secret, payload).encode("ascii"),
+                signature.encode("utf-8")):
+            return None
+        try:
+            user_id, issued_at, generation = map(int, rest.split("."))
+        except ValueError:
+            return None
+        if issued_at + self.ttl < time.time():
+            return None
+        return Claims(user_id, issued_at, generation)
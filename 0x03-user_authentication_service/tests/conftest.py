@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""Shared pytest setup: import the flat modules and use cheap settings
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+os.environ.setdefault("AUTH_DB_URL", "sqlite:///" + os.path.join(
+    tempfile.mkdtemp(), "test.db"))
+os.environ.setdefault("AUTH_BCRYPT_COST", "4")
+os.environ.setdefault("AUTH_SWEEP_INTERVAL", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+
+@pytest.fixture
+def auth(tmp_path):
+    """Auth on a fresh database of its own"""
+    from auth import Auth
+    from db import DB
+
+    return Auth(db=DB("sqlite:///" + str(tmp_path / "a.db"),
+                      sweep_interval=0))
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Tests for the ASGI app
+"""
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+
+def call(body: bytes, path: str = "/sessions", cookie: bytes = b"") -> tuple:
+    """Send one POST to async_app.app and return (status, payload)"""
+    from async_app import app
+
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": path,
+             "headers": [(b"cookie", cookie)] if cookie else []}
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+
+def test_non_utf8_body_is_a_bad_request():
+    """A body that is not UTF-8 gets 400 instead of an unhandled error"""
+    assert call(b"email=\xff&password=x") == \
+        (400, {"message": "request is not valid UTF-8"})
+
+
+def test_non_utf8_cookie_is_a_bad_request():
+    """So does a cookie header that is not UTF-8"""
+    status, _ = call(b"", path="/profile", cookie=b"session_id=\xff")
+    assert status == 400
+
+
+def test_wrong_login_is_unauthorized():
+    """A valid form still reaches its handler"""
+    status, _ = call(b"email=nobody%40x.com&password=x")
+    assert status == 401
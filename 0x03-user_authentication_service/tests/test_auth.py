@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Tests for auth.Auth and the DB lookups behind it
+"""
+import pytest
+from sqlalchemy.orm.exc import NoResultFound
+
+
+def test_find_user_by_never_matches_a_missing_token(auth):
+    """A None token must not select users that have no token"""
+    auth.register_user("a@x.com", "pw")
+    for column in ("reset_token", "session_id"):
+        with pytest.raises(NoResultFound):
+            auth._db.find_user_by(**{column: None})
+
+
+def test_update_password_without_reset_token_is_rejected(auth):
+    """PUT /reset_password with no token must not reset anyone"""
+    auth.register_user("a@x.com", "pw")
+    auth.register_user("b@x.com", "pw")
+    auth.get_reset_password_token("a@x.com")
+    with pytest.raises(ValueError):
+        auth.update_password(None, "hacked")
+    assert not auth.valid_login("b@x.com", "hacked")
+    assert auth.valid_login("b@x.com", "pw")
+
+
+def test_update_password_with_reset_token(auth):
+    """A real reset token changes the password once"""
+    auth.register_user("a@x.com", "pw")
+    token = auth.get_reset_password_token("a@x.com")
+    auth.update_password(token, "new")
+    assert auth.valid_login("a@x.com", "new")
+    with pytest.raises(ValueError):
+        auth.update_password(token, "again")
+
+
+def test_async_update_password_without_reset_token_is_rejected(tmp_path):
+    """The async variant applies the same guard"""
+    pytest.importorskip("aiosqlite")
+    import asyncio
+    from async_auth import AsyncAuth
+    from async_db import AsyncDB
+
+    async def scenario():
+        auth = AsyncAuth()
+        auth._db = AsyncDB("sqlite+aiosqlite:///" + str(tmp_path / "a.db"))
+        await auth.init()
+        await auth.register_user("b@x.com", "pw")
+        with pytest.raises(ValueError):
+            await auth.update_password(None, "hacked")
+        assert not await auth.valid_login("b@x.com", "hacked")
+
+    asyncio.run(scenario())
+
+
+def test_only_weaker_hashes_are_rehashed(monkeypatch):
+    """A hash below the target cost is upgraded; stronger ones are kept"""
+    import auth as auth_module
+
+    monkeypatch.setattr(auth_module, "BCRYPT_ROUNDS", 10)
+    assert auth_module._needs_rehash(b"$2b$09$" + b"x" * 53)
+    assert not auth_module._needs_rehash(b"$2b$10$" + b"x" * 53)
+    assert not auth_module._needs_rehash("$2b$12$" + "x" * 53)
+
+
+def test_login_keeps_a_stronger_hash(auth, monkeypatch):
+    """A process with a lower cost never downgrades a stored hash"""
+    import bcrypt
+    import auth as auth_module
+
+    user = auth.register_user("a@x.com", "pw")
+    stronger = bcrypt.hashpw(b"pw", bcrypt.gensalt(5))
+    auth._db.update_user(user.id, hashed_password=stronger)
+    monkeypatch.setattr(auth_module, "BCRYPT_ROUNDS", 4)
+    assert auth.valid_login("a@x.com", "pw")
+    assert auth._db.find_user_by(email="a@x.com").hashed_password == stronger
+    monkeypatch.setattr(auth_module, "BCRYPT_ROUNDS", 6)
+    assert auth.valid_login("a@x.com", "pw")
+    assert auth._db.find_user_by(
+        email="a@x.com").hashed_password[4:6] == b"06"
+
+
+def test_signed_revocation_reaches_other_processes(tmp_path, monkeypatch):
+    """A logout in one process is seen by another within the short
+    signed-mode user cache TTL, not the session cache TTL"""
+    import auth as auth_module
+    from auth import Auth
+    from db import DB
+    from signed_session import SessionSigner
+
+    clock = [1000.0]
+    monkeypatch.setattr("session_cache.time.monotonic", lambda: clock[0])
+    signer = SessionSigner(keys=[("k", b"secret")])
+    url = "sqlite:///" + str(tmp_path / "a.db")
+    first, second = (Auth("signed", signer, DB(url, sweep_interval=0))
+                     for _ in range(2))
+    assert second._session_cache.ttl == auth_module.SIGNED_USER_CACHE_TTL
+    user = first.register_user("a@x.com", "pw")
+    token = first.create_session("a@x.com")
+    assert second.get_user_from_session_id(token).id == user.id
+    first.destroy_session(user.id)
+    assert first.get_user_from_session_id(token) is None
+    clock[0] += auth_module.SIGNED_USER_CACHE_TTL + 0.01
+    second._db.remove_session()
+    assert second.get_user_from_session_id(token) is None
+
+
+def test_db_mode_logout_reaches_other_processes(tmp_path, monkeypatch):
+    """A logout in one process is seen by another within
+    AUTH_SESSION_CACHE_TTL"""
+    import auth as auth_module
+    from auth import Auth
+    from db import DB
+
+    clock = [1000.0]
+    monkeypatch.setattr("session_cache.time.monotonic", lambda: clock[0])
+    url = "sqlite:///" + str(tmp_path / "a.db")
+    first, second = (Auth("db", db=DB(url, sweep_interval=0))
+                     for _ in range(2))
+    assert second._session_cache.ttl == auth_module.SESSION_CACHE_TTL <= 1
+    user = first.register_user("a@x.com", "pw")
+    session_id = first.create_session("a@x.com")
+    assert second.get_user_from_session_id(session_id).id == user.id
+    first.destroy_session(user.id)
+    assert first.get_user_from_session_id(session_id) is None
+    clock[0] += auth_module.SESSION_CACHE_TTL + 0.01
+    second._db.remove_session()
+    assert second.get_user_from_session_id(session_id) is None
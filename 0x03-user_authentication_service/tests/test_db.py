@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Tests for db.DB and its background helpers
+"""
+import logging
+import time
+
+import pytest
+from sqlalchemy.orm.exc import NoResultFound
+
+from db import DB
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    """Poll condition until it holds or timeout passes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_group_commit_writes_batches(tmp_path):
+    """Staged sessions are visible at once and committed by the flusher"""
+    db = DB("sqlite:///" + str(tmp_path / "a.db"), sweep_interval=0,
+            group_commit_window=0.01)
+    user = db.add_user("a@x.com", b"hash")
+    db.update_user(user.id, session_id="s1")
+    assert db.find_user_by(session_id="s1").id == user.id
+    assert wait_for(lambda: db._group_commit.pending(user.id) is None)
+    db.remove_session()
+    assert db.find_user_by(session_id="s1").id == user.id
+
+
+def test_failed_group_commit_is_logged_and_dropped(tmp_path, caplog):
+    """A batch that keeps failing is logged, then no longer overlaid"""
+    db = DB("sqlite:///" + str(tmp_path / "a.db"), sweep_interval=0,
+            group_commit_window=0.01)
+    committer = db._group_commit
+    committer.max_retries = 3
+    attempts = []
+
+    def fail(batch):
+        attempts.append(batch)
+        raise RuntimeError("database is down")
+
+    committer._write = fail
+    user = db.add_user("a@x.com", b"hash")
+    with caplog.at_level(logging.WARNING, logger="db"):
+        db.update_user(user.id, session_id="s1")
+        assert wait_for(lambda: committer.dropped == 1)
+    assert len(attempts) == 3
+    assert committer.pending(user.id) is None
+    with pytest.raises(NoResultFound):
+        db.find_user_by(session_id="s1")
+    levels = [record.levelno for record in caplog.records]
+    assert levels == [logging.WARNING, logging.WARNING, logging.ERROR]
+
+
+def test_failed_sweep_is_logged(tmp_path, caplog, monkeypatch):
+    """The sweeper logs a failing pass and keeps running"""
+    from db import ExpirySweeper
+
+    db = DB("sqlite:///" + str(tmp_path / "a.db"), sweep_interval=0)
+    calls = []
+
+    def fail(batch_size):
+        calls.append(batch_size)
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(db, "sweep_expired", fail)
+    with caplog.at_level(logging.ERROR, logger="db"):
+        ExpirySweeper(db, interval=0.01, batch_size=10, pause=0)
+        assert wait_for(lambda: len(calls) >= 2)
+    assert "expiry sweep failed" in caplog.text
+
+
+def test_in_memory_database():
+    """sqlite:// has no QueuePool, so no pool sizing is passed to it"""
+    db = DB("sqlite://", sweep_interval=0)
+    user = db.add_user("a@x.com", b"hash")
+    assert db.find_user_by(email="a@x.com").id == user.id
+
+
+def test_file_database_keeps_pool_settings(tmp_path):
+    """File databases still get the configured QueuePool size"""
+    db = DB("sqlite:///" + str(tmp_path / "a.db"), sweep_interval=0,
+            pool_size=3, max_overflow=2)
+    assert db._engine.pool.size() == 3
+    assert db._engine.pool._max_overflow == 2
+
+
+def test_sweep_drains_a_large_backlog_in_batches(tmp_path):
+    """Each sweep clears at most one batch per token kind, repeated
+    sweeps drain the backlog, and live tokens are left alone"""
+    from sqlalchemy import func, select, update
+    from db import expires_in
+    from user import User
+
+    backlog, live, batch = 3000, 200, 250
+    db = DB("sqlite:///" + str(tmp_path / "a.db"), sweep_interval=0)
+    db.add_users_bulk((f"u{index}@x.com", b"x")
+                      for index in range(backlog + live))
+    table = User.__table__
+    with db._engine.begin() as connection:
+        connection.execute(update(table).where(table.c.id <= backlog).values(
+            session_id=table.c.email, session_expires_at=expires_in(-60),
+            reset_token=table.c.email, reset_expires_at=expires_in(-60)))
+        connection.execute(update(table).where(table.c.id > backlog).values(
+            session_id=table.c.email, session_expires_at=expires_in(3600),
+            reset_token=table.c.email, reset_expires_at=expires_in(3600)))
+
+    def remaining(column):
+        with db._engine.connect() as connection:
+            return connection.execute(
+                select(func.count()).select_from(table)
+                .where(table.c[column].is_not(None))).scalar()
+
+    sweeps = 0
+    while True:
+        before = remaining("session_id"), remaining("reset_token")
+        cleared = db.sweep_expired(batch)
+        after = remaining("session_id"), remaining("reset_token")
+        assert cleared <= batch
+        assert all(0 <= b - a <= batch for b, a in zip(before, after))
+        sweeps += 1
+        if cleared == 0:
+            break
+    assert sweeps == backlog // batch + 1
+    assert remaining("session_id") == live
+    assert remaining("reset_token") == live
+    with db._engine.connect() as connection:
+        kept = connection.execute(
+            select(table.c.id).where(table.c.session_id.is_not(None),
+                                     table.c.reset_token.is_not(None))
+        ).scalars().all()
+    assert sorted(kept) == list(range(backlog + 1, backlog + live + 1))
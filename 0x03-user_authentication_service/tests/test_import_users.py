@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Tests for the bulk user import
+"""
+import bcrypt
+
+from import_users import hash_record, import_users
+
+
+def write_csv(path, rows):
+    """Write rows under an email,password,hashed_password header"""
+    path.write_text("email,password,hashed_password\n" + "".join(
+        ",".join(row) + "\n" for row in rows))
+    return str(path)
+
+
+def test_empty_hashed_password_cell_hashes_the_password(auth, tmp_path):
+    """An empty hashed_password cell is not stored as an empty hash"""
+    stored = bcrypt.hashpw(b"pre", bcrypt.gensalt(4)).decode()
+    path = write_csv(tmp_path / "users.csv", [
+        ("plain@x.com", "pw", ""),
+        ("blank@x.com", "pw", "   "),
+        ("hashed@x.com", "", stored),
+    ])
+    assert import_users(auth._db, path, batch_size=2, workers=1) == 3
+    assert auth.valid_login("plain@x.com", "pw")
+    assert auth.valid_login("blank@x.com", "pw")
+    assert auth.valid_login("hashed@x.com", "pre")
+    assert not auth.valid_login("plain@x.com", "wrong")
+
+
+def test_rows_without_a_usable_password_are_rejected(auth, tmp_path,
+                                                     capsys):
+    """Missing passwords and malformed hashes are counted, not stored"""
+    path = write_csv(tmp_path / "users.csv", [
+        ("none@x.com", "", ""),
+        ("bad@x.com", "pw", "$2b$12$tooshort"),
+        ("ok@x.com", "pw", ""),
+    ])
+    assert import_users(auth._db, path, workers=1) == 1
+    assert "1 inserted, 2 rejected" in capsys.readouterr().err
+    assert not auth.valid_login("none@x.com", "")
+    assert not auth.valid_login("bad@x.com", "pw")
+    assert auth.valid_login("ok@x.com", "pw")
+
+
+def test_password_that_looks_like_a_hash_prefix_is_hashed():
+    """Only a complete bcrypt hash is reused from the password column"""
+    hashed = hash_record({"password": "$2b$not-a-hash"})
+    assert bcrypt.checkpw(b"$2b$not-a-hash", hashed)
@@ -2,7 +2,7 @@
 """
 User model definition.
 """
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, DateTime, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -17,11 +17,18 @@ class User(Base):
         email: String unique email address.
         hashed_password: String hashed password.
         session_id: String session ID.
+        session_expires_at: UTC time after which session_id is invalid.
         reset_token: String reset password token.
+        reset_expires_at: UTC time after which reset_token is invalid.
+        session_generation: Integer bumped to revoke signed session tokens.
     """
     __tablename__ = 'users'
     id = Column(Integer, primary_key=True)
-    email = Column(String(250), nullable=False)
+    email = Column(String(250), nullable=False, unique=True, index=True)
     hashed_password = Column(String(250), nullable=False)
-    session_id = Column(String(250), nullable=True)
-    reset_token = Column(String(250), nullable=True)
+    session_id = Column(String(250), nullable=True, index=True)
+    session_expires_at = Column(DateTime, nullable=True, index=True)
+    reset_token = Column(String(250), nullable=True, index=True)
+    reset_expires_at = Column(DateTime, nullable=True, index=True)
+    session_generation = Column(Integer, nullable=False, default=0,
+                                server_default="0")